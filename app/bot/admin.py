@@ -11,18 +11,22 @@ from typing import Optional
 
 from zoneinfo import ZoneInfo
 
-from aiogram import Router
+from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.exceptions import TelegramBadRequest
-from sqlalchemy import func, select, literal, and_, or_, delete, text
+from sqlalchemy import case, func, select, insert, literal, and_, or_, delete, text, bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 
 from dateutil.relativedelta import relativedelta
 
-from app.bot.auth import is_owner, is_admin
+from app.bot.auth import OwnerFilter
+from app.bot.handlers.nav import _promo_norm
 from app.bot.keyboards import kb_admin_menu, kb_admin_referrals_menu, kb_foreign_admin_menu, kb_foreign_admin_requests, kb_foreign_admin_request_view
+from app.bot.ui import parse_uint
 from app.core.config import settings
 from app.db.models import Referral, ReferralEarning, Subscription, User, Payment
 from app.db.models.vpn_peer import VpnPeer
@@ -894,8 +898,9 @@ def _predict_payment_probability_percent(
         score += min(0.12, max(0, renewals_after_warning - 1) * 0.06)
 
     if last_interaction_at is not None:
-        last_dt = _ensure_tz_utc(last_interaction_at) or _utcnow()
-        days_idle = max(0.0, ((_utcnow() - last_dt).total_seconds() / 86400.0))
+        now = _utcnow()
+        last_dt = _ensure_tz_utc(last_interaction_at) or now
+        days_idle = max(0.0, ((now - last_dt).total_seconds() / 86400.0))
         if days_idle <= 3:
             score += 0.14
         elif days_idle <= 7:
@@ -1937,6 +1942,16 @@ def _region_service() -> RegionVpnService:
     )
 
 router = Router()
+# The whole admin module is owner/admin-only: reject other users before any handler runs.
+router.message.filter(OwnerFilter())
+# Every admin callback is namespaced "admin:", so other callbacks skip this router's handler list outright.
+router.callback_query.filter(F.data.startswith("admin:"))
+router.callback_query.filter(OwnerFilter())
+
+# The admin menus have no per-user state (only process-wide settings), so build them once.
+_KB_ADMIN_MENU = kb_admin_menu()
+_KB_ADMIN_REFERRALS_MENU = kb_admin_referrals_menu()
+_KB_FOREIGN_ADMIN_MENU = kb_foreign_admin_menu()
 
 AMSTERDAM_TZ = ZoneInfo("Europe/Amsterdam")
 
@@ -1958,7 +1973,15 @@ _MONTH_NUM_RU = {
     "ноября": 11,
     "декабря": 12,
 }
-_RU_DATE_RE = re.compile(r"^\s*(\d{1,2})\s+([а-яё]+)\s+(\d{4})\s*$", re.IGNORECASE)
+# Input is lowercased and ё-folded before matching (no IGNORECASE). The month group only
+# matches the 12 known words, so a successful match always has a valid month.
+_RU_DATE_RE = re.compile(
+    r"^\s*(\d{1,2})\s+(" + "|".join(map(re.escape, _MONTH_NUM_RU)) + r")\s+(\d{4})\s*$"
+)
+_YO_TR = str.maketrans("ё", "е")
+
+# Anything outside the label alphabet; dropped in one C-level scan.
+_LABEL_STRIP_RE = re.compile(r"[^A-Za-z0-9_\-]+")
 
 
 def _utcnow() -> datetime:
@@ -1980,19 +2003,14 @@ def _parse_ru_date_to_utc_end_of_day(s: str) -> Optional[datetime]:
     """
     Parse "9 февраля 2026" -> 2026-02-09 23:59:59 UTC
     """
-    s = (s or "").strip().lower().replace("ё", "е")
-    m = _RU_DATE_RE.match(s)
+    # the pattern tolerates surrounding whitespace itself, so no strip() copy
+    m = _RU_DATE_RE.match((s or "").lower().translate(_YO_TR))
     if not m:
         return None
-    day = int(m.group(1))
-    month_name = m.group(2).lower()
-    year = int(m.group(3))
-    month = _MONTH_NUM_RU.get(month_name)
-    if not month:
-        return None
+    day_s, month_s, year_s = m.groups()
     try:
-        return datetime(year, month, day, 23, 59, 59, tzinfo=timezone.utc)
-    except Exception:
+        return datetime(int(year_s), _MONTH_NUM_RU[month_s], int(day_s), 23, 59, 59, tzinfo=timezone.utc)
+    except ValueError:  # e.g. 31 февраля
         return None
 
 
@@ -2019,9 +2037,9 @@ def _parse_end_at_input_to_utc(s: str) -> datetime | None:
 
 
 def _normalize_label(label: str) -> str:
-    label = (label or "").strip()
-    label = re.sub(r"\s+", "_", label)
-    label = re.sub(r"[^A-Za-z0-9_\-]", "", label)
+    # split() strips and collapses whitespace runs in one C pass (same as \s+ -> "_").
+    label = "_".join((label or "").split())
+    label = _LABEL_STRIP_RE.sub("", label)
     return label[:64]
 
 
@@ -2050,8 +2068,9 @@ async def _resolve_tg_id(bot, raw: str) -> int | None:
     s = (raw or "").strip()
     if not s:
         return None
-    if s.isdigit():
-        return int(s)
+    tg_id = parse_uint(s)
+    if tg_id:
+        return tg_id
     if s.startswith("@"):  # try resolve via get_chat
         try:
             chat = await bot.get_chat(s)
@@ -2191,12 +2210,6 @@ class AdminPromoDeleteFSM(StatesGroup):
     waiting_code = State()
 
 
-def _promo_norm(code: str) -> str:
-    code = (code or "").strip().upper()
-    code = "".join(ch for ch in code if ch.isalnum() or ch in "_-")
-    return code[:32]
-
-
 async def _promo_defs(session) -> dict[str, int]:
     rows = (await session.execute(select(AppSetting).where(AppSetting.key.like("promo:def:%")))).scalars().all()
     out: dict[str, int] = {}
@@ -2220,25 +2233,22 @@ def _kb_admin_promos() -> InlineKeyboardMarkup:
 # ADMIN MENU
 # ==========================
 
-@router.callback_query(lambda c: c.data == "admin:menu")
-async def admin_menu(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        # Не показываем админку не-владельцам, но обязательно отвечаем на callback,
-        # иначе у пользователя будет "часики" и ощущение, что бот завис.
-        await cb.answer()
-        return
+# Only the VPN status line varies between admin menu renders.
+_ADMIN_MENU_TMPL = "🛠 <b>Админка</b>\n\n{vpn_line}\n\nВыберите действие:"
 
-    # Answer ASAP to avoid "query is too old" когда мы делаем сетевые вызовы ниже.
-    try:
-        await cb.answer()
-    except Exception:
-        pass
 
-    # Best-effort VPN status block (never fail admin menu)
+@router.callback_query(F.data == "admin:menu")
+async def admin_menu(cb: CallbackQuery) -> None:
+    # Answer right away (avoids "query is too old"), overlapped with the VPN status call below.
+    # Best-effort VPN status block (never fail admin menu): errors come back as values.
+    _answered, st = await asyncio.gather(
+        cb.answer(),
+        asyncio.wait_for(vpn_service.get_server_status(), timeout=4),
+        return_exceptions=True,
+    )
     vpn_line = "🌍 VPN: статус недоступен"
     try:
-        st = await asyncio.wait_for(vpn_service.get_server_status(), timeout=4)
-        if st.get("ok"):
+        if isinstance(st, dict) and st.get("ok"):
             cpu = st.get("cpu_load_percent")
             act = st.get("active_peers")
             tot = st.get("total_peers")
@@ -2250,23 +2260,19 @@ async def admin_menu(cb: CallbackQuery) -> None:
     except Exception:
         pass
 
-    text = (
-        "🛠 <b>Админка</b>\n\n"
-        f"{vpn_line}\n\n"
-        "Выберите действие:"
-    )
+    text = _ADMIN_MENU_TMPL.format(vpn_line=vpn_line)
 
     # Telegram не разрешает редактировать сообщение, если контент/клавиатура не изменились.
     # В таком случае отправим новое сообщение, чтобы пользователь увидел результат.
     try:
         await cb.message.edit_text(
             text,
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
             parse_mode="HTML",
         )
     except TelegramBadRequest as e:
         if "message is not modified" in str(e):
-            await cb.message.answer(text, reply_markup=kb_admin_menu(), parse_mode="HTML")
+            await cb.message.answer(text, reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
         else:
             raise
 
@@ -2321,12 +2327,8 @@ async def _render_users_page(page: int) -> tuple[str, InlineKeyboardMarkup]:
     return text, _kb_admin_users(page, pages)
 
 
-@router.callback_query(lambda c: c.data == "admin:users")
+@router.callback_query(F.data == "admin:users")
 async def admin_users(cb: CallbackQuery) -> None:
-    if not (is_owner(cb.from_user.id) or is_admin(cb.from_user.id)):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -2342,12 +2344,8 @@ async def admin_users(cb: CallbackQuery) -> None:
             raise
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:users:page:"))
+@router.callback_query(F.data.startswith("admin:users:page:"))
 async def admin_users_page(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -2398,11 +2396,8 @@ def _kb_admin_diag_refresh(full: bool = False) -> InlineKeyboardMarkup:
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:diag")
+@router.callback_query(F.data == "admin:diag")
 async def admin_diag_menu(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     text = (
         "🩺 <b>Проверка системы</b>\n\n"
@@ -2417,11 +2412,8 @@ async def admin_diag_menu(cb: CallbackQuery) -> None:
         await cb.message.answer(text, reply_markup=_kb_admin_diag(), parse_mode="HTML")
 
 
-@router.callback_query(lambda c: c.data in {"admin:diag:quick", "admin:diag:full"})
+@router.callback_query(F.data.in_({"admin:diag:quick", "admin:diag:full"}))
 async def admin_diag_run(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     full = cb.data.endswith(':full')
     try:
         await cb.answer("Проверяю систему…")
@@ -2441,11 +2433,8 @@ async def admin_diag_run(cb: CallbackQuery) -> None:
 
 
 
-@router.callback_query(lambda c: c.data == "admin:diag:dedupe_wg")
+@router.callback_query(F.data == "admin:diag:dedupe_wg")
 async def admin_diag_dedupe_wg(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         await cb.answer("Чищу дубли WG…")
     except Exception:
@@ -3006,12 +2995,8 @@ async def _render_user_card(session, bot, tg_id: int) -> str:
 
 
 
-@router.callback_query(lambda c: c.data == "admin:payments:reconcile")
+@router.callback_query(F.data == "admin:payments:reconcile")
 async def admin_payments_reconcile(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer("Проверяю оплаты…")
     except Exception:
@@ -3057,15 +3042,11 @@ async def admin_payments_reconcile(cb: CallbackQuery) -> None:
                 f"• #{pay.id} | tg <code>{pay.tg_id}</code> | <b>{html.escape(str(pay.status or '—'))}</b> | {int(pay.amount or 0)} ₽ | {_fmt_dt_short(pay.paid_at)} | <code>{pid}</code>"
             )
 
-    await cb.message.answer("\n".join(lines), reply_markup=kb_admin_menu(), parse_mode="HTML")
+    await cb.message.answer("\n".join(lines), reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
 
 
-@router.callback_query(lambda c: c.data == "admin:lte:repair")
+@router.callback_query(F.data == "admin:lte:repair")
 async def admin_lte_repair(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer("Проверяю LTE…")
     except Exception:
@@ -3104,14 +3085,10 @@ async def admin_lte_repair(cb: CallbackQuery) -> None:
     else:
         lines.append("\n⚠️ Есть ошибки. Проверь логи последнего деплоя.")
 
-    await cb.message.answer("\n".join(lines), reply_markup=kb_admin_menu(), parse_mode="HTML")
+    await cb.message.answer("\n".join(lines), reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
 
-@router.callback_query(lambda c: c.data == "admin:price")
+@router.callback_query(F.data == "admin:price")
 async def admin_price(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     async with session_scope() as session:
         current_price = await get_price_rub(session)
 
@@ -3133,11 +3110,8 @@ async def admin_price(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.answer()
 
 
-@router.callback_query(lambda c: c.data == "admin:user:inspect")
+@router.callback_query(F.data == "admin:user:inspect")
 async def admin_user_inspect_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     await state.set_state(AdminUserInspectFSM.waiting_user)
     await cb.message.edit_text(
@@ -3150,8 +3124,6 @@ async def admin_user_inspect_start(cb: CallbackQuery, state: FSMContext) -> None
 
 @router.message(AdminUserInspectFSM.waiting_user)
 async def admin_user_inspect_input(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
     raw = (message.text or "").strip()
     tg_id = await _resolve_tg_id(message.bot, raw)
     if not tg_id:
@@ -3180,11 +3152,8 @@ async def admin_user_inspect_input(message: Message, state: FSMContext) -> None:
             )
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:card:"))
+@router.callback_query(F.data.startswith("admin:user:card:"))
 async def admin_user_card_refresh(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     try:
         tg_id = int((cb.data or "").split(":")[-1])
@@ -3284,11 +3253,8 @@ async def _peer_delete_menu_text(session, tg_id: int) -> tuple[str, InlineKeyboa
     return "\n".join(lines), InlineKeyboardMarkup(inline_keyboard=kb_rows)
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:peer_delete_menu:"))
+@router.callback_query(F.data.startswith("admin:user:peer_delete_menu:"))
 async def admin_user_peer_delete_menu(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     try:
         tg_id = int((cb.data or "").split(":")[-1])
@@ -3299,11 +3265,8 @@ async def admin_user_peer_delete_menu(cb: CallbackQuery) -> None:
     await cb.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:peer_delete_confirm:"))
+@router.callback_query(F.data.startswith("admin:user:peer_delete_confirm:"))
 async def admin_user_peer_delete_confirm(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     try:
         parts = (cb.data or "").split(":")
@@ -3340,11 +3303,8 @@ async def admin_user_peer_delete_confirm(cb: CallbackQuery) -> None:
     await cb.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:peer_delete_apply:"))
+@router.callback_query(F.data.startswith("admin:user:peer_delete_apply:"))
 async def admin_user_peer_delete_apply(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer("Удаляю peer…")
     try:
         parts = (cb.data or "").split(":")
@@ -3391,11 +3351,8 @@ async def admin_user_peer_delete_apply(cb: CallbackQuery) -> None:
     ])
     await cb.message.edit_text(summary_text, reply_markup=kb, parse_mode="HTML")
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:gift_revoke:"))
+@router.callback_query(F.data.startswith("admin:user:gift_revoke:"))
 async def admin_user_gift_revoke_menu(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         tg_id = int((cb.data or "").split(":")[-1])
     except Exception:
@@ -3407,11 +3364,8 @@ async def admin_user_gift_revoke_menu(cb: CallbackQuery) -> None:
     await cb.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:gift_revoke_pick:"))
+@router.callback_query(F.data.startswith("admin:user:gift_revoke_pick:"))
 async def admin_user_gift_revoke_pick(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     parts = (cb.data or "").split(":")
     if len(parts) < 5:
         await cb.answer("Некорректные данные", show_alert=True)
@@ -3445,14 +3399,14 @@ async def admin_user_gift_revoke_pick(cb: CallbackQuery) -> None:
         days = int(getattr(pay, "period_days", 0) or 0)
         delta_months = months
         delta_days = days if months == 0 else 0
+        now = _utcnow()
         old_end = sub.end_at
-        base_end = old_end or _utcnow()
+        base_end = old_end or now
         new_end = base_end
         if delta_months:
             new_end = new_end - relativedelta(months=delta_months)
         if delta_days:
             new_end = new_end - timedelta(days=delta_days)
-        now = _utcnow()
         if new_end < now:
             new_end = now
 
@@ -3468,7 +3422,7 @@ async def admin_user_gift_revoke_pick(cb: CallbackQuery) -> None:
     await cb.message.edit_text(text, reply_markup=_kb_user_card(tg_id), parse_mode="HTML")
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:notify_expired:"))
+@router.callback_query(F.data.startswith("admin:user:notify_expired:"))
 async def admin_user_notify_expired(cb: CallbackQuery) -> None:
     """Manual reminder to pay after subscription expired.
 
@@ -3476,10 +3430,6 @@ async def admin_user_notify_expired(cb: CallbackQuery) -> None:
     We log both success and failure via message_audit.
     """
 
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await cb.answer()
     try:
         tg_id = int((cb.data or "").split(":")[-1])
@@ -3531,11 +3481,8 @@ async def admin_user_notify_expired(cb: CallbackQuery) -> None:
             pass
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:set_end_at:"))
+@router.callback_query(F.data.startswith("admin:user:set_end_at:"))
 async def admin_user_set_end_at_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     try:
         tg_id = int((cb.data or "").split(":")[-1])
@@ -3558,11 +3505,8 @@ async def admin_user_set_end_at_start(cb: CallbackQuery, state: FSMContext) -> N
 
 
 
-@router.callback_query(lambda c: (c.data or "") == "admin:family_price")
+@router.callback_query(F.data == "admin:family_price")
 async def admin_family_price_menu_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     await state.clear()
     await state.set_state(AdminFamilyPriceMenuFSM.waiting_user)
@@ -3577,12 +3521,8 @@ async def admin_family_price_menu_start(cb: CallbackQuery, state: FSMContext) ->
 
 @router.message(AdminFamilyPriceMenuFSM.waiting_user)
 async def admin_family_price_menu_user(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-    raw = (message.text or "").strip()
-    try:
-        tg_id = int(raw)
-    except Exception:
+    tg_id = parse_uint(message.text)
+    if not tg_id:
         await message.answer("Пришлите TG ID числом, например 123456789")
         return
 
@@ -3597,14 +3537,10 @@ async def admin_family_price_menu_user(message: Message, state: FSMContext) -> N
 
 @router.message(AdminFamilyPriceMenuFSM.waiting_price)
 async def admin_family_price_menu_price(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
     data = await state.get_data()
     tg_id = int(data.get("tg_id") or 0)
-    raw = (message.text or "").strip()
-    try:
-        price = int(raw)
-    except Exception:
+    price = parse_uint(message.text)
+    if price is None:
         await message.answer("Введите число, например 100")
         return
 
@@ -3622,11 +3558,8 @@ async def admin_family_price_menu_price(message: Message, state: FSMContext) ->
     await message.answer(card, parse_mode="HTML", reply_markup=_kb_admin_user_card_actions(tg_id))
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:user:set_family_price:"))
+@router.callback_query(F.data.startswith("admin:user:set_family_price:"))
 async def admin_user_set_family_price_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     try:
         tg_id = int((cb.data or "").split(":")[-1])
@@ -3646,14 +3579,10 @@ async def admin_user_set_family_price_start(cb: CallbackQuery, state: FSMContext
 
 @router.message(AdminUserSetFamilyPriceFSM.waiting_price)
 async def admin_user_set_family_price_input(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
     data = await state.get_data()
     tg_id = int(data.get("tg_id") or 0)
-    raw = (message.text or "").strip()
-    try:
-        price = int(raw)
-    except Exception:
+    price = parse_uint(message.text)
+    if price is None:
         await message.answer("Введите число, например 100")
         return
 
@@ -3674,8 +3603,6 @@ async def admin_user_set_family_price_input(message: Message, state: FSMContext)
 
 @router.message(AdminUserSetEndAtFSM.waiting_end_at)
 async def admin_user_set_end_at_finish(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
     data = await state.get_data()
     tg_id = int(data.get("tg_id") or 0)
     end_at_utc = _parse_end_at_input_to_utc(message.text or "")
@@ -3728,11 +3655,8 @@ def _kb_yandex_gate(*, blocked: bool) -> InlineKeyboardMarkup:
     ])
 
 
-@router.callback_query(lambda c: c.data == "admin:yandex:gate")
+@router.callback_query(F.data == "admin:yandex:gate")
 async def admin_yandex_gate(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     async with session_scope() as session:
         blocked = bool(await get_app_setting_int(session, "yandex_invites_blocked", default=0) or 0)
@@ -3746,11 +3670,8 @@ async def admin_yandex_gate(cb: CallbackQuery) -> None:
     await cb.message.edit_text(text, reply_markup=_kb_yandex_gate(blocked=blocked), parse_mode="HTML")
 
 
-@router.callback_query(lambda c: (c.data or "") in {"admin:yandex:gate:on", "admin:yandex:gate:off"})
+@router.callback_query(F.data.in_({"admin:yandex:gate:on", "admin:yandex:gate:off"}))
 async def admin_yandex_gate_toggle(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     blocked = (cb.data or "").endswith(":on")
     async with session_scope() as session:
         await set_app_setting_int(session, "yandex_invites_blocked", 1 if blocked else 0)
@@ -3759,12 +3680,9 @@ async def admin_yandex_gate_toggle(cb: CallbackQuery) -> None:
     await admin_yandex_gate(cb)
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:grace")
+@router.callback_query(F.data == "admin:vpn:grace")
 async def admin_vpn_grace_list(cb: CallbackQuery) -> None:
     """List users within the 24h grace window after subscription expiration."""
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
 
     now = _utcnow()
@@ -3788,7 +3706,7 @@ async def admin_vpn_grace_list(cb: CallbackQuery) -> None:
     if not peers:
         await cb.message.edit_text(
             "🕒 <b>WG grace (24ч)</b>\n\nСейчас нет пользователей в окне 24 часов после окончания подписки.",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
             parse_mode="HTML",
         )
         return
@@ -3815,14 +3733,11 @@ async def admin_vpn_grace_list(cb: CallbackQuery) -> None:
         mins = int((left.total_seconds() % 3600) // 60)
         lines.append(f"• <code>{tid}</code> — до <b>{_fmt_dt_short(until)}</b> (осталось {hrs} ч {mins} мин)")
 
-    await cb.message.edit_text("\n".join(lines), reply_markup=kb_admin_menu(), parse_mode="HTML")
+    await cb.message.edit_text("\n".join(lines), reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
 
 
 @router.message(AdminPriceFSM.waiting_price)
 async def admin_price_set(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     raw = (message.text or "").strip()
     # allow formats like "299", "299 ₽"
     raw = re.sub(r"[^0-9]", "", raw)
@@ -3847,19 +3762,15 @@ async def admin_price_set(message: Message, state: FSMContext) -> None:
     await state.clear()
     await message.answer(
         f"✅ Цена подписки обновлена: <b>{new_price} ₽</b>",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
         parse_mode="HTML",
     )
 
 
 
 
-@router.callback_query(lambda c: c.data == "admin:lte_price")
+@router.callback_query(F.data == "admin:lte_price")
 async def admin_lte_price(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     async with session_scope() as session:
         current_price = await get_app_setting_int(session, "lte_activation_rub", default=settings.lte_activation_rub)
 
@@ -3883,9 +3794,6 @@ async def admin_lte_price(cb: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(AdminLtePriceFSM.waiting_price)
 async def admin_lte_price_set(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     raw = re.sub(r"[^0-9]", "", (message.text or "").strip())
     if not raw:
         await message.answer("❌ Введите цену числом, например: 99", reply_markup=_kb_admin_back())
@@ -3908,18 +3816,15 @@ async def admin_lte_price_set(message: Message, state: FSMContext) -> None:
     await state.clear()
     await message.answer(
         f"✅ Цена активации VPN LTE обновлена: <b>{new_price} ₽</b>",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
         parse_mode="HTML",
     )
 
 
 
 
-@router.callback_query(lambda c: c.data == "admin:promos")
+@router.callback_query(F.data == "admin:promos")
 async def admin_promos(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     async with session_scope() as session:
         defs = await _promo_defs(session)
@@ -3935,11 +3840,8 @@ async def admin_promos(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.answer()
 
 
-@router.callback_query(lambda c: c.data == "admin:promos:create")
+@router.callback_query(F.data == "admin:promos:create")
 async def admin_promos_create_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.set_state(AdminPromoCreateFSM.waiting_code)
     await cb.message.edit_text("🎟 <b>Создание промокода</b>\n\nОтправьте код промокода.\nДопустимы буквы, цифры, <code>_</code> и <code>-</code>.", reply_markup=_kb_admin_back(), parse_mode="HTML")
     await cb.answer()
@@ -3947,8 +3849,6 @@ async def admin_promos_create_start(cb: CallbackQuery, state: FSMContext) -> Non
 
 @router.message(AdminPromoCreateFSM.waiting_code)
 async def admin_promos_create_code(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
     code = _promo_norm(message.text or "")
     if not code:
         await message.answer("❌ Некорректный код промокода.", reply_markup=_kb_admin_back())
@@ -3960,8 +3860,6 @@ async def admin_promos_create_code(message: Message, state: FSMContext) -> None:
 
 @router.message(AdminPromoCreateFSM.waiting_price)
 async def admin_promos_create_price(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
     raw = re.sub(r"[^0-9]", "", (message.text or "").strip())
     if not raw:
         await message.answer("❌ Введите цену числом, например: 149", reply_markup=_kb_admin_back())
@@ -3970,7 +3868,7 @@ async def admin_promos_create_price(message: Message, state: FSMContext) -> None
     data = await state.get_data()
     code = _promo_norm(str(data.get("promo_code") or ""))
     if not code or price <= 0:
-        await message.answer("❌ Не удалось создать промокод.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Не удалось создать промокод.", reply_markup=_KB_ADMIN_MENU)
         await state.clear()
         return
     async with session_scope() as session:
@@ -3981,14 +3879,11 @@ async def admin_promos_create_price(message: Message, state: FSMContext) -> None
         await set_app_setting_int(session, f"promo:def:{code}", price)
         await session.commit()
     await state.clear()
-    await message.answer(f"✅ Промокод <code>{html.escape(code)}</code> создан. Новая цена: <b>{price} ₽</b>", reply_markup=kb_admin_menu(), parse_mode="HTML")
+    await message.answer(f"✅ Промокод <code>{html.escape(code)}</code> создан. Новая цена: <b>{price} ₽</b>", reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
 
 
-@router.callback_query(lambda c: c.data == "admin:promos:delete")
+@router.callback_query(F.data == "admin:promos:delete")
 async def admin_promos_delete_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.set_state(AdminPromoDeleteFSM.waiting_code)
     await cb.message.edit_text("🗑 <b>Удаление промокода</b>\n\nОтправьте код промокода, который нужно удалить.", reply_markup=_kb_admin_back(), parse_mode="HTML")
     await cb.answer()
@@ -3996,8 +3891,6 @@ async def admin_promos_delete_start(cb: CallbackQuery, state: FSMContext) -> Non
 
 @router.message(AdminPromoDeleteFSM.waiting_code)
 async def admin_promos_delete_finish(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
     code = _promo_norm(message.text or "")
     if not code:
         await message.answer("❌ Укажите код промокода.", reply_markup=_kb_admin_back())
@@ -4010,7 +3903,7 @@ async def admin_promos_delete_finish(message: Message, state: FSMContext) -> Non
         await session.delete(row)
         await session.commit()
     await state.clear()
-    await message.answer(f"✅ Промокод <code>{html.escape(code)}</code> удалён.", reply_markup=kb_admin_menu(), parse_mode="HTML")
+    await message.answer(f"✅ Промокод <code>{html.escape(code)}</code> удалён.", reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
 
 
 # ==========================
@@ -4018,12 +3911,8 @@ async def admin_promos_delete_finish(message: Message, state: FSMContext) -> Non
 # ==========================
 
 
-@router.callback_query(lambda c: c.data == "admin:sub:gift")
+@router.callback_query(F.data == "admin:sub:gift")
 async def admin_sub_gift_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.clear()
     await state.set_state(AdminGiftSubFSM.waiting_target)
 
@@ -4046,9 +3935,6 @@ async def admin_sub_gift_start(cb: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(AdminGiftSubFSM.waiting_target)
 async def admin_sub_gift_target(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     raw = (message.text or "").strip()
     if not raw:
         await message.answer("❌ Укажите Telegram ID или @username.", reply_markup=_kb_admin_back())
@@ -4077,9 +3963,6 @@ async def admin_sub_gift_target(message: Message, state: FSMContext) -> None:
 
 @router.message(AdminGiftSubFSM.waiting_months)
 async def admin_sub_gift_months(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     raw = re.sub(r"[^0-9]", "", (message.text or "").strip())
     if not raw:
         await message.answer("❌ Введите число месяцев, например: 1", reply_markup=_kb_admin_back())
@@ -4099,7 +3982,7 @@ async def admin_sub_gift_months(message: Message, state: FSMContext) -> None:
     target_tg_id = int(data.get("gift_tg_id") or 0)
     if not target_tg_id:
         await state.clear()
-        await message.answer("⚠️ Не найден получатель. Начните заново.", reply_markup=kb_admin_menu())
+        await message.answer("⚠️ Не найден получатель. Начните заново.", reply_markup=_KB_ADMIN_MENU)
         return
 
     from app.db.models.subscription import Subscription
@@ -4157,19 +4040,15 @@ async def admin_sub_gift_months(message: Message, state: FSMContext) -> None:
         f"Пользователь: <code>{target_tg_id}</code>\n"
         f"Срок: <b>{months}</b> мес.\n"
         f"Новая дата окончания: <b>{new_end.date().isoformat()}</b>",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
         parse_mode="HTML",
     )
 
 
 
 
-@router.callback_query(lambda c: (c.data or "") in {"admin:sub:gift_days:all", "admin:sub:gift_days:active"})
+@router.callback_query(F.data.in_({"admin:sub:gift_days:all", "admin:sub:gift_days:active"}))
 async def admin_sub_gift_days_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     mode = "active" if (cb.data or "").endswith(":active") else "all"
     await state.clear()
     await state.update_data(gift_days_mode=mode)
@@ -4193,9 +4072,6 @@ async def admin_sub_gift_days_start(cb: CallbackQuery, state: FSMContext) -> Non
 
 @router.message(AdminGiftDaysFSM.waiting_days)
 async def admin_sub_gift_days_finish(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     raw = re.sub(r"[^0-9]", "", (message.text or "").strip())
     if not raw:
         await message.answer("❌ Введите количество дней числом, например: 3", reply_markup=_kb_admin_back())
@@ -4303,16 +4179,13 @@ async def admin_sub_gift_days_finish(message: Message, state: FSMContext) -> Non
         f"Из них были неактивны и стали активны: <b>{activated}</b>\n"
         f"Восстановлено WG peer (best-effort): <b>{restored_peers}</b>\n"
         f"Уведомлений отправлено: <b>{notified}</b>",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
         parse_mode="HTML",
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:broadcast:all")
+@router.callback_query(F.data == "admin:broadcast:all")
 async def admin_broadcast_all_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.update_data(broadcast_mode="all")
     await state.set_state(AdminBroadcastFSM.waiting_text)
@@ -4327,11 +4200,8 @@ async def admin_broadcast_all_start(cb: CallbackQuery, state: FSMContext) -> Non
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:broadcast:paid")
+@router.callback_query(F.data == "admin:broadcast:paid")
 async def admin_broadcast_paid_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.update_data(broadcast_mode="paid")
     await state.set_state(AdminBroadcastFSM.waiting_text)
@@ -4346,11 +4216,8 @@ async def admin_broadcast_paid_start(cb: CallbackQuery, state: FSMContext) -> No
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:broadcast:unpaid")
+@router.callback_query(F.data == "admin:broadcast:unpaid")
 async def admin_broadcast_unpaid_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.update_data(broadcast_mode="unpaid")
     await state.set_state(AdminBroadcastFSM.waiting_text)
@@ -4365,11 +4232,8 @@ async def admin_broadcast_unpaid_start(cb: CallbackQuery, state: FSMContext) ->
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:broadcast:one")
+@router.callback_query(F.data == "admin:broadcast:one")
 async def admin_broadcast_one_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.set_state(AdminBroadcastFSM.waiting_target)
     try:
@@ -4385,8 +4249,6 @@ async def admin_broadcast_one_start(cb: CallbackQuery, state: FSMContext) -> Non
 
 @router.message(AdminBroadcastFSM.waiting_target)
 async def admin_broadcast_one_target(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
     raw = (message.text or "").strip()
     if not raw:
         await message.answer("❌ Укажите Telegram ID или @username.", reply_markup=_kb_admin_back())
@@ -4410,9 +4272,6 @@ async def admin_broadcast_one_target(message: Message, state: FSMContext) -> Non
 
 @router.message(AdminBroadcastFSM.waiting_text)
 async def admin_broadcast_send(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     photo = None
     payload = ""
     parse_mode = "HTML"
@@ -4453,7 +4312,7 @@ async def admin_broadcast_send(message: Message, state: FSMContext) -> None:
         target = int(data.get("broadcast_target") or 0)
         if not target:
             await state.clear()
-            await message.answer("⚠️ Получатель не найден. Начните заново.", reply_markup=kb_admin_menu())
+            await message.answer("⚠️ Получатель не найден. Начните заново.", reply_markup=_KB_ADMIN_MENU)
             return
         try:
             ok = await audit_send_message(
@@ -4473,9 +4332,9 @@ async def admin_broadcast_send(message: Message, state: FSMContext) -> None:
             failed = 1
         await state.clear()
         if sent:
-            await message.answer(f"✅ Сообщение отправлено пользователю <code>{target}</code>.", reply_markup=kb_admin_menu(), parse_mode="HTML")
+            await message.answer(f"✅ Сообщение отправлено пользователю <code>{target}</code>.", reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
         else:
-            await message.answer(f"⚠️ Не удалось отправить сообщение пользователю <code>{target}</code>.", reply_markup=kb_admin_menu(), parse_mode="HTML")
+            await message.answer(f"⚠️ Не удалось отправить сообщение пользователю <code>{target}</code>.", reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
         return
 
     now = _utcnow()
@@ -4543,16 +4402,13 @@ async def admin_broadcast_send(message: Message, state: FSMContext) -> None:
         f"Тип: <b>{content_label}</b>\n"
         f"Доставлено: <b>{sent}</b>\n"
         f"Ошибок: <b>{failed}</b>",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
         parse_mode="HTML",
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:stats:full")
+@router.callback_query(F.data == "admin:stats:full")
 async def admin_full_stats(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         await cb.answer("Собираю полную статистику…")
     except Exception:
@@ -4643,11 +4499,8 @@ async def admin_full_stats(cb: CallbackQuery) -> None:
     await _send_html_chunks(cb.message, parts, reply_markup=_kb_admin_due_soon_tools(), edit_first=True)
 
 
-@router.callback_query(lambda c: c.data == "admin:stats:conversions")
+@router.callback_query(F.data == "admin:stats:conversions")
 async def admin_conversions_report(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         await cb.answer("Собираю конверсии…")
     except Exception:
@@ -4674,9 +4527,10 @@ async def admin_conversions_report(cb: CallbackQuery) -> None:
     weekly = list(stats.get('paid_growth_weekly') or [])
     if weekly:
         show_weekly = weekly[-12:]
+        now = _utcnow()
         for item in show_weekly:
-            start_txt = (_ensure_tz_utc(item['start']) or _utcnow()).strftime('%d.%m.%Y')
-            end_txt = (_ensure_tz_utc(item['end']) or _utcnow()).strftime('%d.%m.%Y')
+            start_txt = (_ensure_tz_utc(item['start']) or now).strftime('%d.%m.%Y')
+            end_txt = (_ensure_tz_utc(item['end']) or now).strftime('%d.%m.%Y')
             delta = int(item.get('delta', 0) or 0)
             sign = '+' if delta > 0 else ''
             lines.append(f"• {start_txt} — {end_txt}: <b>{int(item.get('count', 0) or 0)}</b> новых платящих | Разбор: <b>{sign}{delta}</b>")
@@ -4698,11 +4552,8 @@ async def admin_conversions_report(cb: CallbackQuery) -> None:
     await _send_html_chunks(cb.message, parts, reply_markup=_kb_admin_due_soon_tools(), edit_first=True)
 
 
-@router.callback_query(lambda c: c.data == "admin:stats:due_soon")
+@router.callback_query(F.data == "admin:stats:due_soon")
 async def admin_due_soon_report(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         await cb.answer("Собираю оплаты на горизонте…")
     except Exception:
@@ -4752,11 +4603,8 @@ async def admin_due_soon_report(cb: CallbackQuery) -> None:
 
 
 
-@router.callback_query(lambda c: c.data == "admin:stats:due_diag")
+@router.callback_query(F.data == "admin:stats:due_diag")
 async def admin_due_soon_diag(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         await cb.answer("Собираю диагностику…")
     except Exception:
@@ -4788,11 +4636,8 @@ async def admin_due_soon_diag(cb: CallbackQuery) -> None:
     await _send_html_chunks(cb.message, parts, reply_markup=_kb_admin_due_soon_tools(), edit_first=True)
 
 
-@router.callback_query(lambda c: c.data == "admin:stats:due_resend")
+@router.callback_query(F.data == "admin:stats:due_resend")
 async def admin_due_soon_resend(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         await cb.answer("Досылаю последнее напоминание…")
     except Exception:
@@ -4838,11 +4683,8 @@ async def admin_due_soon_resend(cb: CallbackQuery) -> None:
         f"📨 <b>Досылка завершена</b>\n\nУспешно отправлено: <b>{sent_count}</b>\nНе удалось отправить: <b>{fail_count}</b>",
         reply_markup=_kb_admin_due_soon_tools(), parse_mode='HTML'
     )
-@router.callback_query(lambda c: c.data == "admin:stats:churn")
+@router.callback_query(F.data == "admin:stats:churn")
 async def admin_churn_report(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         await cb.answer("Собираю отток…")
     except Exception:
@@ -4890,11 +4732,8 @@ async def admin_churn_report(cb: CallbackQuery) -> None:
     await _send_html_chunks(cb.message, parts, reply_markup=_kb_admin_due_soon_tools(), edit_first=True)
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:servers")
+@router.callback_query(F.data == "admin:vpn:servers")
 async def admin_vpn_servers(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     try:
         await cb.answer()
     except Exception:
@@ -4916,11 +4755,8 @@ async def admin_vpn_servers(cb: CallbackQuery) -> None:
     await cb.message.edit_text("\n".join(lines), reply_markup=_kb_admin_vpn_servers(servers, enabled_map), parse_mode="HTML")
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:vpn:servers:view:"))
+@router.callback_query(F.data.startswith("admin:vpn:servers:view:"))
 async def admin_vpn_servers_view(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     code = (cb.data or "").split(":")[-1].upper()
     servers = _load_vpn_servers_admin()
     srv = next((s for s in servers if str((s or {}).get("code") or "").strip().upper() == code), None)
@@ -4941,11 +4777,8 @@ async def admin_vpn_servers_view(cb: CallbackQuery) -> None:
     await cb.message.edit_text(txt, reply_markup=_kb_admin_vpn_servers(servers, enabled_map), parse_mode="HTML")
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:vpn:servers:toggle:"))
+@router.callback_query(F.data.startswith("admin:vpn:servers:toggle:"))
 async def admin_vpn_servers_toggle(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     code = (cb.data or "").split(":")[-1].upper()
     servers = _load_vpn_servers_admin()
     codes = [str((s or {}).get("code") or "").strip().upper() for s in servers if str((s or {}).get("code") or "").strip()]
@@ -4973,12 +4806,8 @@ async def admin_vpn_servers_toggle(cb: CallbackQuery) -> None:
         lines.append(f"• <b>{html.escape(name)}</b> ({html.escape(c)}) — {state}")
     await cb.message.edit_text("\n".join(lines), reply_markup=_kb_admin_vpn_servers(servers, enabled_map), parse_mode="HTML")
 
-@router.callback_query(lambda c: c.data == "admin:vpn:status")
+@router.callback_query(F.data == "admin:vpn:status")
 async def admin_vpn_status(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -5049,13 +4878,9 @@ async def admin_vpn_status(cb: CallbackQuery) -> None:
             raise
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:extra")
+@router.callback_query(F.data == "admin:vpn:extra")
 async def admin_vpn_extra_start(cb: CallbackQuery, state: FSMContext) -> None:
     """Admins: create extra WG configs for themselves (multiple devices)."""
-    if not is_admin(cb.from_user.id):
-        await cb.answer()
-        return
-
     await cb.answer()
     await state.clear()
     await state.set_state(AdminVpnExtraFSM.waiting_count)
@@ -5070,17 +4895,8 @@ async def admin_vpn_extra_start(cb: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(AdminVpnExtraFSM.waiting_count)
 async def admin_vpn_extra_finish(message: Message, state: FSMContext) -> None:
-    if not is_admin(message.from_user.id):
-        await state.clear()
-        return
-
-    raw = (message.text or "").strip()
-    try:
-        n = int(raw)
-    except Exception:
-        await message.answer("Введите число от 1 до 5.")
-        return
-    if n < 1 or n > 5:
+    n = parse_uint(message.text)
+    if n is None or n < 1 or n > 5:
         await message.answer("Введите число от 1 до 5.")
         return
 
@@ -5093,7 +4909,7 @@ async def admin_vpn_extra_finish(message: Message, state: FSMContext) -> None:
         vpn_svc = VPNService()
     except Exception:
         await state.clear()
-        await message.answer("⚠️ VPN сервис не настроен (нет WG_* env).", reply_markup=kb_admin_menu())
+        await message.answer("⚠️ VPN сервис не настроен (нет WG_* env).", reply_markup=_KB_ADMIN_MENU)
         return
 
     created = 0
@@ -5143,18 +4959,14 @@ async def admin_vpn_extra_finish(message: Message, state: FSMContext) -> None:
         tail = f"\n\n⚠️ Ошибка: <code>{html.escape(str(last_error)[:300])}</code>"
     await message.answer(
         f"✅ Создано конфигов: <b>{created}</b> из <b>{n}</b>.{tail}",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
         parse_mode="HTML",
     )
 
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:queue_sim")
+@router.callback_query(F.data == "admin:vpn:queue_sim")
 async def admin_vpn_queue_sim(cb: CallbackQuery) -> None:
-    if not (is_owner(cb.from_user.id) or is_admin(cb.from_user.id)):
-        await cb.answer()
-        return
-
     try:
         await cb.answer("Запускаю симуляцию очереди…")
     except Exception:
@@ -5179,12 +4991,8 @@ async def admin_vpn_queue_sim(cb: CallbackQuery) -> None:
     await _send_html_chunks(cb.message, parts, reply_markup=_kb_admin_back(), edit_first=False)
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:test_config")
+@router.callback_query(F.data == "admin:vpn:test_config")
 async def admin_vpn_test_config(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -5196,12 +5004,8 @@ async def admin_vpn_test_config(cb: CallbackQuery) -> None:
     )
 
 
-@router.callback_query(lambda c: c.data.startswith("admin:vpn:test_config:create:"))
+@router.callback_query(F.data.startswith("admin:vpn:test_config:create:"))
 async def admin_vpn_test_config_create(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     preferred_code = str(cb.data or "").split(":")[-1].strip().upper()
     try:
         await cb.answer("Создаю тестовый конфиг…")
@@ -5237,12 +5041,8 @@ async def admin_vpn_test_config_create(cb: CallbackQuery) -> None:
         )
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:test_config:reset")
+@router.callback_query(F.data == "admin:vpn:test_config:reset")
 async def admin_vpn_test_config_reset(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -5307,12 +5107,8 @@ async def _reset_admin_test_configs_for_codes(*, tg_id: int, server_codes: set[s
     return removed, touched_servers, errors
 
 
-@router.callback_query(lambda c: c.data.startswith("admin:vpn:test_config:reset_server:"))
+@router.callback_query(F.data.startswith("admin:vpn:test_config:reset_server:"))
 async def admin_vpn_test_config_reset_server(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     code = str(cb.data or "").split(":")[-1].strip().upper()
     try:
         await cb.answer(f"Удаляю тестовые конфиги с {code}…")
@@ -5346,12 +5142,8 @@ async def admin_vpn_test_config_reset_server(cb: CallbackQuery) -> None:
     await cb.message.answer("\n".join(lines), reply_markup=_kb_admin_back(), parse_mode="HTML")
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:test_config:reset_all")
+@router.callback_query(F.data == "admin:vpn:test_config:reset_all")
 async def admin_vpn_test_config_reset_all(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer("Удаляю тестовые конфиги на всех серверах…")
     except Exception:
@@ -5382,13 +5174,9 @@ async def admin_vpn_test_config_reset_all(cb: CallbackQuery) -> None:
     await cb.message.answer("\n".join(lines), reply_markup=_kb_admin_back(), parse_mode="HTML")
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:usage")
+@router.callback_query(F.data == "admin:vpn:usage")
 
 async def admin_vpn_usage(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -5529,12 +5317,8 @@ async def admin_vpn_usage(cb: CallbackQuery) -> None:
 
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:active_profiles")
+@router.callback_query(F.data == "admin:vpn:active_profiles")
 async def admin_vpn_active_profiles(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -5687,11 +5471,8 @@ async def admin_vpn_active_profiles(cb: CallbackQuery) -> None:
             raise
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:server_users")
+@router.callback_query(F.data == "admin:vpn:server_users")
 async def admin_vpn_server_users_menu(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     text = "🗂 <b>Пользователи по серверам</b>\n\nВыберите сервер."
     try:
@@ -5703,11 +5484,8 @@ async def admin_vpn_server_users_menu(cb: CallbackQuery) -> None:
             raise
 
 
-@router.callback_query(lambda c: (c.data or "").startswith("admin:vpn:server_users:"))
+@router.callback_query(F.data.startswith("admin:vpn:server_users:"))
 async def admin_vpn_server_users_list(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await cb.answer()
     try:
         idx = int((cb.data or '').split(':')[-1])
@@ -5832,12 +5610,8 @@ async def admin_vpn_server_users_list(cb: CallbackQuery) -> None:
             raise
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:active_lte_profiles")
+@router.callback_query(F.data == "admin:vpn:active_lte_profiles")
 async def admin_vpn_active_lte_profiles(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -5901,13 +5675,9 @@ async def admin_vpn_active_lte_profiles(cb: CallbackQuery) -> None:
             raise
 
 
-@router.callback_query(lambda c: c.data == "admin:regionvpn:profiles")
+@router.callback_query(F.data == "admin:regionvpn:profiles")
 async def admin_regionvpn_profiles(cb: CallbackQuery) -> None:
     """List provisioned VPN-Region profiles (VLESS clients in Xray config)."""
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     try:
         await cb.answer()
     except Exception:
@@ -5990,7 +5760,7 @@ async def admin_regionvpn_profiles(cb: CallbackQuery) -> None:
         else:
             raise
 
-@router.callback_query(lambda c: c.data == "admin:regionvpn:active")
+@router.callback_query(F.data == "admin:regionvpn:active")
 async def admin_regionvpn_active(cb: CallbackQuery) -> None:
     """List active VPN-Region sessions (last device IP per user)."""
     try:
@@ -6025,12 +5795,8 @@ async def admin_regionvpn_active(cb: CallbackQuery) -> None:
         await cb.answer()
 
 
-@router.callback_query(lambda c: c.data == "admin:referrals:menu")
+@router.callback_query(F.data == "admin:referrals:menu")
 async def admin_referrals_menu(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.clear()
 
     try:
@@ -6041,19 +5807,16 @@ async def admin_referrals_menu(cb: CallbackQuery, state: FSMContext) -> None:
     text = "🔁 <b>Управление рефералами</b>\n\nВыберите действие:"
 
     try:
-        await cb.message.edit_text(text, reply_markup=kb_admin_referrals_menu(), parse_mode="HTML")
+        await cb.message.edit_text(text, reply_markup=_KB_ADMIN_REFERRALS_MENU, parse_mode="HTML")
     except TelegramBadRequest as e:
         if "message is not modified" in str(e):
-            await cb.message.answer(text, reply_markup=kb_admin_referrals_menu(), parse_mode="HTML")
+            await cb.message.answer(text, reply_markup=_KB_ADMIN_REFERRALS_MENU, parse_mode="HTML")
         else:
             raise
 
 
-@router.callback_query(lambda c: c.data == "admin:ref:take:self")
+@router.callback_query(F.data == "admin:ref:take:self")
 async def admin_ref_take_self(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.set_state(AdminReferralAssignFSM.waiting_referred)
     await state.update_data(mode="take_self")
@@ -6066,11 +5829,8 @@ async def admin_ref_take_self(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.answer()
 
 
-@router.callback_query(lambda c: c.data == "admin:ref:assign")
+@router.callback_query(F.data == "admin:ref:assign")
 async def admin_ref_assign(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.set_state(AdminReferralAssignFSM.waiting_referred)
     await state.update_data(mode="assign")
@@ -6083,11 +5843,8 @@ async def admin_ref_assign(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.answer()
 
 
-@router.callback_query(lambda c: c.data == "admin:ref:reset")
+@router.callback_query(F.data == "admin:ref:reset")
 async def admin_ref_reset(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.set_state(AdminReferralAssignFSM.waiting_referred)
     await state.update_data(mode="reset")
@@ -6102,9 +5859,6 @@ async def admin_ref_reset(cb: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(AdminReferralAssignFSM.waiting_referred)
 async def admin_ref_wait_referred(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     referred_id = await _resolve_tg_id_from_text(message.bot, message.text or "")
     if not referred_id:
         await message.answer("❌ Не получилось распознать пользователя. Пришли TG ID (цифры) или @username")
@@ -6130,7 +5884,7 @@ async def admin_ref_wait_referred(message: Message, state: FSMContext) -> None:
             f"Был у: <b>{prev_lbl}</b>\n"
             f"Теперь у: <b>{await _format_user_label(message.bot, new_owner_id)}</b>",
             parse_mode="HTML",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
         )
         return
 
@@ -6150,7 +5904,7 @@ async def admin_ref_wait_referred(message: Message, state: FSMContext) -> None:
             f"Был у: <b>{prev_lbl}</b>\n"
             "Теперь отображается как: <b>пришёл самостоятельно</b>",
             parse_mode="HTML",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
         )
         return
 
@@ -6165,9 +5919,6 @@ async def admin_ref_wait_referred(message: Message, state: FSMContext) -> None:
 
 @router.message(AdminReferralAssignFSM.waiting_new_owner)
 async def admin_ref_wait_new_owner(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     new_owner_id = await _resolve_tg_id_from_text(message.bot, message.text or "")
     if not new_owner_id:
         await message.answer("❌ Не получилось распознать пользователя. Пришли TG ID (цифры) или @username")
@@ -6177,7 +5928,7 @@ async def admin_ref_wait_new_owner(message: Message, state: FSMContext) -> None:
     referred_id = int(data.get("referred_id") or 0)
     if not referred_id:
         await state.clear()
-        await message.answer("❌ Сессия сбилась. Открой управление рефералами заново.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Сессия сбилась. Открой управление рефералами заново.", reply_markup=_KB_ADMIN_MENU)
         return
 
     async with session_scope() as session:
@@ -6196,15 +5947,12 @@ async def admin_ref_wait_new_owner(message: Message, state: FSMContext) -> None:
         f"Был у: <b>{prev_lbl}</b>\n"
         f"Теперь у: <b>{await _format_user_label(message.bot, int(new_owner_id))}</b>",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:ref:percent")
+@router.callback_query(F.data == "admin:ref:percent")
 async def admin_ref_percent_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.set_state(AdminReferralPercentFSM.waiting_target)
     await cb.message.edit_text(
@@ -6218,9 +5966,6 @@ async def admin_ref_percent_start(cb: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(AdminReferralPercentFSM.waiting_target)
 async def admin_ref_percent_wait_target(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     target_id = await _resolve_tg_id_from_text(message.bot, message.text or "")
     if not target_id:
         await message.answer("❌ Не получилось распознать пользователя. Пришли TG ID (цифры) или @username")
@@ -6249,26 +5994,22 @@ async def admin_ref_percent_wait_target(message: Message, state: FSMContext) ->
 
 @router.message(AdminReferralPercentFSM.waiting_percent)
 async def admin_ref_percent_wait_percent(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     data = await state.get_data()
     target_tg_id = int(data.get("target_tg_id") or 0)
     if not target_tg_id:
         await state.clear()
-        await message.answer("❌ Сессия сбилась. Открой управление рефералами заново.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Сессия сбилась. Открой управление рефералами заново.", reply_markup=_KB_ADMIN_MENU)
         return
 
     raw = (message.text or "").strip().lower()
     reset_words = {"reset", "сброс", "очистить", "clear", "default", "по умолчанию"}
     percent_value = None
     if raw not in reset_words:
-        try:
-            percent_value = int(raw)
-        except Exception:
+        percent_value = parse_uint(raw)
+        if percent_value is None:
             await message.answer("❌ Пришли число от 0 до 100 или reset/сброс для возврата к стандартной лестнице.")
             return
-        if percent_value < 0 or percent_value > 100:
+        if percent_value > 100:
             await message.answer("❌ Процент должен быть от 0 до 100.")
             return
 
@@ -6304,15 +6045,12 @@ async def admin_ref_percent_wait_percent(message: Message, state: FSMContext) ->
         f"Текущий процент: <b>{int(progress.get('current_percent', 0) or 0)}%</b>\n"
         f"{next_line}",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:ref:owner")
+@router.callback_query(F.data == "admin:ref:owner")
 async def admin_ref_owner(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
     await state.clear()
     await state.set_state(AdminReferralOwnerFSM.waiting_referred)
     await cb.message.edit_text(
@@ -6326,9 +6064,6 @@ async def admin_ref_owner(cb: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(AdminReferralOwnerFSM.waiting_referred)
 async def admin_ref_owner_wait(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     referred_id = await _resolve_tg_id_from_text(message.bot, message.text or "")
     if not referred_id:
         await message.answer("❌ Не получилось распознать пользователя. Пришли TG ID (цифры) или @username")
@@ -6345,50 +6080,92 @@ async def admin_ref_owner_wait(message: Message, state: FSMContext) -> None:
         f"Реферал: <b>{ref_lbl}</b>\n"
         f"Владелец: <b>{owner_lbl}</b>",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
+# Hot admin lookups built once; SQLAlchemy caches their compiled SQL by statement key.
+_STMT_ACC_BY_LABEL = select(YandexAccount).where(YandexAccount.label == bindparam("label")).limit(1)
+_STMT_LAST_PAYOUTS = (
+    select(PayoutRequest.id, PayoutRequest.tg_id, PayoutRequest.amount_rub, PayoutRequest.status)
+    .order_by(PayoutRequest.id.desc())
+    .limit(20)
+)
+
+
+def _format_payout(r) -> str:
+    """One line of the admin payouts list from a _STMT_LAST_PAYOUTS row."""
+    return f"• ID <code>{r.id}</code> | TG <code>{r.tg_id}</code> | {r.amount_rub} ₽ | <b>{r.status}</b>"
+
+
+async def _yandex_account_from_state(session, data: dict, *, id_key: str, label_key: str) -> YandexAccount | None:
+    """Resolve the account an FSM flow is working on.
+
+    Prefer the id stored by the previous step (PK lookup / identity map);
+    fall back to the label for flows started before the id was stored.
+    """
+    acc_id = data.get(id_key)
+    if acc_id:
+        return await session.get(YandexAccount, int(acc_id))
+    return await session.scalar(_STMT_ACC_BY_LABEL, {"label": data.get(label_key)})
+
+
+async def _upsert_free_slots(session, acc_id: int, links: list[str]) -> int:
+    """Write invite links for slots 1..N in one statement.
+
+    Missing slots are inserted as free; existing slots get the new link only
+    while they are still free (issued/burned are never touched, S1).
+    Returns how many slots were written.
+    """
+    stmt = pg_insert(YandexInviteSlot).values(
+        [
+            {"yandex_account_id": acc_id, "slot_index": idx, "invite_link": link, "status": "free"}
+            for idx, link in enumerate(links, start=1)
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[YandexInviteSlot.yandex_account_id, YandexInviteSlot.slot_index],
+        set_={"invite_link": stmt.excluded.invite_link, "updated_at": func.now()},
+        where=YandexInviteSlot.status == "free",
+    ).returning(YandexInviteSlot.slot_index)
+    return len((await session.execute(stmt)).all())
+
+
 # =========================================================
 # ADD ACCOUNT (step-by-step): label -> plus_end_at -> 3 links
 # =========================================================
 
-@router.callback_query(lambda c: c.data == "admin:yandex:add")
+@router.callback_query(F.data == "admin:yandex:add")
 async def admin_yandex_add(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.clear()
     await state.set_state(AdminYandexFSM.waiting_label)
 
     try:
-        await cb.message.edit_text(
-            "➕ <b>Добавление Yandex-аккаунта</b>\n\n"
-            "1) Отправь <b>название аккаунта</b> (LABEL)\n"
-            "Пример: <code>YA_ACC_1</code>\n\n"
-            "Дальше я спрошу дату окончания Plus и 3 ссылки.",
-            reply_markup=kb_admin_menu(),
-            parse_mode="HTML",
+        await asyncio.gather(
+            cb.message.edit_text(
+                "➕ <b>Добавление Yandex-аккаунта</b>\n\n"
+                "1) Отправь <b>название аккаунта</b> (LABEL)\n"
+                "Пример: <code>YA_ACC_1</code>\n\n"
+                "Дальше я спрошу дату окончания Plus и 3 ссылки.",
+                reply_markup=_KB_ADMIN_MENU,
+                parse_mode="HTML",
+            ),
+            cb.answer(),
         )
     except TelegramBadRequest as e:
         # Telegram не даёт отредактировать сообщение, если текст/клавиатура не изменились.
         if "message is not modified" not in str(e):
             raise
-    await cb.answer()
 
 
 @router.message(AdminYandexFSM.waiting_label)
 async def admin_yandex_waiting_label(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     label = _normalize_label(message.text or "")
     if not label:
         await message.answer(
             "❌ Не понял label. Пример: <code>YA_ACC_1</code>",
             parse_mode="HTML",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
         )
         return
 
@@ -6401,15 +6178,12 @@ async def admin_yandex_waiting_label(message: Message, state: FSMContext) -> Non
         "<code>9 февраля 2026</code>\n\n"
         "Это дата окончания Plus на этом аккаунте (вводишь вручную).",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
 @router.message(AdminYandexFSM.waiting_plus_end)
 async def admin_yandex_waiting_plus_end(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     plus_end_at = _parse_ru_date_to_utc_end_of_day(message.text or "")
     if not plus_end_at:
         await message.answer(
@@ -6417,7 +6191,7 @@ async def admin_yandex_waiting_plus_end(message: Message, state: FSMContext) ->
             "Нужно: <code>9 февраля 2026</code>\n"
             "Попробуй ещё раз.",
             parse_mode="HTML",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
         )
         return
 
@@ -6425,26 +6199,27 @@ async def admin_yandex_waiting_plus_end(message: Message, state: FSMContext) ->
     label = data.get("label")
     if not label:
         await state.clear()
-        await message.answer("❌ Сессия сбилась. Нажми «➕ Добавить Yandex-аккаунт» ещё раз.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Сессия сбилась. Нажми «➕ Добавить Yandex-аккаунт» ещё раз.", reply_markup=_KB_ADMIN_MENU)
         return
 
-    async with session_scope() as session:
-        acc = await session.scalar(select(YandexAccount).where(YandexAccount.label == label).limit(1))
-        if not acc:
-            acc = YandexAccount(
-                label=label,
-                status="active",
-                max_slots=4,  # legacy field
-                used_slots=0,
-            )
-            session.add(acc)
-            await session.flush()
+    # Create the account or refresh an existing one with the same label: one upsert, no SELECT first.
+    stmt = pg_insert(YandexAccount).values(
+        label=label,
+        status="active",
+        plus_end_at=plus_end_at,
+        max_slots=4,  # legacy field
+        used_slots=0,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[YandexAccount.label],
+        set_={"plus_end_at": stmt.excluded.plus_end_at, "status": "active", "updated_at": func.now()},
+    ).returning(YandexAccount.id)
 
-        acc.plus_end_at = plus_end_at
-        acc.status = "active"
+    async with session_scope() as session:
+        acc_id = await session.scalar(stmt)
         await session.commit()
 
-    await state.update_data(plus_end_at_iso=plus_end_at.isoformat())
+    await state.update_data(acc_id=acc_id, plus_end_at_iso=plus_end_at.isoformat())
     await state.set_state(AdminYandexFSM.waiting_links)
 
     await message.answer(
@@ -6456,58 +6231,41 @@ async def admin_yandex_waiting_plus_end(message: Message, state: FSMContext) ->
         f"Аккаунт: <code>{label}</code>\n"
         f"Plus до: <code>{plus_end_at.date().isoformat()}</code>",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
 @router.message(AdminYandexFSM.waiting_links)
 async def admin_yandex_waiting_links(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     lines = [ln.strip() for ln in (message.text or "").splitlines() if ln.strip()]
     if len(lines) != 3:
         await message.answer(
             "❌ Нужно ровно 3 строки — три ссылки (слоты 1..3).",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
         )
         return
 
     data = await state.get_data()
     label = data.get("label")
-    if not label:
+    # The plus_end step always stores the upserted account id.
+    acc_id = data.get("acc_id")
+    if not label or not acc_id:
         await state.clear()
-        await message.answer("❌ Сессия сбилась. Нажми «➕ Добавить Yandex-аккаунт» ещё раз.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Сессия сбилась. Нажми «➕ Добавить Yandex-аккаунт» ещё раз.", reply_markup=_KB_ADMIN_MENU)
         return
 
     async with session_scope() as session:
-        acc = await session.scalar(select(YandexAccount).where(YandexAccount.label == label).limit(1))
-        if not acc:
+        # IMPORTANT: do not overwrite issued/burned (S1) — enforced by the upsert's WHERE.
+        try:
+            await _upsert_free_slots(session, int(acc_id), lines)
+            await session.commit()
+        except IntegrityError:
+            # FK miss: the account was deleted between steps.
+            await session.rollback()
             await state.clear()
-            await message.answer("❌ Аккаунт не найден. Начни добавление заново.", reply_markup=kb_admin_menu())
+            await message.answer("❌ Аккаунт не найден. Начни добавление заново.", reply_markup=_KB_ADMIN_MENU)
             return
 
-        for idx, link in enumerate(lines, start=1):
-            slot = await session.scalar(
-                select(YandexInviteSlot)
-                .where(YandexInviteSlot.yandex_account_id == acc.id, YandexInviteSlot.slot_index == idx)
-                .limit(1)
-            )
-            if not slot:
-                slot = YandexInviteSlot(
-                    yandex_account_id=acc.id,
-                    slot_index=idx,
-                    invite_link=link,
-                    status="free",
-                )
-                session.add(slot)
-            else:
-                # IMPORTANT: do not overwrite issued/burned (S1)
-                if (slot.status or "free") == "free":
-                    slot.invite_link = link
-
-        await session.commit()
-
     await state.clear()
 
     await message.answer(
@@ -6515,7 +6273,7 @@ async def admin_yandex_waiting_links(message: Message, state: FSMContext) -> Non
         f"Аккаунт: <code>{label}</code>\n"
         "Слоты 1..3 загружены (free слоты обновлены, issued/burned не тронуты).",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
@@ -6523,87 +6281,101 @@ async def admin_yandex_waiting_links(message: Message, state: FSMContext) -> Non
 # LIST ACCOUNTS/SLOTS
 # ==========================
 
-@router.callback_query(lambda c: c.data == "admin:yandex:list")
-async def admin_yandex_list(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
+def _yandex_list_text(rows) -> str:
+    lines = ["📋 <b>Yandex аккаунты / слоты</b>\n"]
+    for label, status, plus_end_at, free_cnt, issued_cnt in rows:
+        plus_str = _fmt_plus_end_at(plus_end_at)
+        lines.append(
+            f"• <code>{html.escape(str(label))}</code> — {html.escape(str(status))} | Plus до: <code>{plus_str}</code> | "
+            f"slots free/issued: <b>{int(free_cnt or 0)}</b>/<b>{int(issued_cnt or 0)}</b>"
+        )
+    return "\n".join(lines)
 
-    async with session_scope() as session:
-        accounts = (await session.scalars(select(YandexAccount).order_by(YandexAccount.id.asc()))).all()
-        if not accounts:
-            await cb.message.edit_text(
-                "📋 <b>Yandex аккаунты</b>\n\nПока пусто. Нажми «➕ Добавить Yandex-аккаунт».",
-                reply_markup=kb_admin_menu(),
-                parse_mode="HTML",
-            )
-            await cb.answer()
-            return
 
-        lines = ["📋 <b>Yandex аккаунты / слоты</b>\n"]
-        for acc in accounts:
-            free_cnt = await session.scalar(
-                select(func.count(YandexInviteSlot.id)).where(
-                    YandexInviteSlot.yandex_account_id == acc.id,
-                    YandexInviteSlot.status == "free",
-                )
-            )
-            issued_cnt = await session.scalar(
-                select(func.count(YandexInviteSlot.id)).where(
-                    YandexInviteSlot.yandex_account_id == acc.id,
-                    YandexInviteSlot.status != "free",
+@router.callback_query(F.data == "admin:yandex:list")
+async def admin_yandex_list(cb: CallbackQuery) -> None:
+    slot_counts = (
+        select(
+            YandexInviteSlot.yandex_account_id.label("acc_id"),
+            func.sum(case((YandexInviteSlot.status == "free", 1), else_=0)).label("free_cnt"),
+            func.sum(case((YandexInviteSlot.status != "free", 1), else_=0)).label("issued_cnt"),
+        )
+        .group_by(YandexInviteSlot.yandex_account_id)
+        .subquery()
+    )
+    async with session_scope() as session:
+        # Accounts with their free/issued slot counts in a single round-trip.
+        rows = (
+            await session.execute(
+                select(
+                    YandexAccount.label,
+                    YandexAccount.status,
+                    YandexAccount.plus_end_at,
+                    slot_counts.c.free_cnt,
+                    slot_counts.c.issued_cnt,
                 )
+                .outerjoin(slot_counts, slot_counts.c.acc_id == YandexAccount.id)
+                .order_by(YandexAccount.id.asc())
             )
-            plus_str = _fmt_plus_end_at(acc.plus_end_at)
-            lines.append(
-                f"• <code>{acc.label}</code> — {acc.status} | Plus до: <code>{plus_str}</code> | "
-                f"slots free/issued: <b>{int(free_cnt or 0)}</b>/<b>{int(issued_cnt or 0)}</b>"
+        ).all()
+        if not rows:
+            await asyncio.gather(
+                cb.message.edit_text(
+                    "📋 <b>Yandex аккаунты</b>\n\nПока пусто. Нажми «➕ Добавить Yandex-аккаунт».",
+                    reply_markup=_KB_ADMIN_MENU,
+                    parse_mode="HTML",
+                ),
+                cb.answer(),
             )
+            return
 
-    await cb.message.edit_text("\n".join(lines), reply_markup=kb_admin_menu(), parse_mode="HTML")
-    await cb.answer()
+    text = _yandex_list_text(rows)
+    # Repeat taps on an unchanged list: skip the edit round trip Telegram would reject as "not modified".
+    # getattr-based read: an InaccessibleMessage (older than 48h) has no html_text.
+    if _message_html_text(cb.message) == text:
+        await cb.answer()
+        return
+    await asyncio.gather(
+        cb.message.edit_text(text, reply_markup=_KB_ADMIN_MENU, parse_mode="HTML"),
+        cb.answer(),
+    )
 
 
 # ==========================
 # EDIT ACCOUNT (label -> new date -> optional links)
 # ==========================
 
-@router.callback_query(lambda c: c.data == "admin:yandex:edit")
+@router.callback_query(F.data == "admin:yandex:edit")
 async def admin_yandex_edit(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.clear()
     await state.set_state(AdminYandexFSM.edit_waiting_label)
 
-    await cb.message.edit_text(
-        "✏️ <b>Редактирование Yandex-аккаунта</b>\n\n"
-        "Отправь <b>LABEL</b> аккаунта, который хочешь изменить.\n"
-        "Пример: <code>YA_ACC_1</code>",
-        reply_markup=kb_admin_menu(),
-        parse_mode="HTML",
+    await asyncio.gather(
+        cb.message.edit_text(
+            "✏️ <b>Редактирование Yandex-аккаунта</b>\n\n"
+            "Отправь <b>LABEL</b> аккаунта, который хочешь изменить.\n"
+            "Пример: <code>YA_ACC_1</code>",
+            reply_markup=_KB_ADMIN_MENU,
+            parse_mode="HTML",
+        ),
+        cb.answer(),
     )
-    await cb.answer()
 
 
 @router.message(AdminYandexFSM.edit_waiting_label)
 async def admin_yandex_edit_waiting_label(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     label = _normalize_label(message.text or "")
     if not label:
-        await message.answer("❌ Не понял label. Пример: <code>YA_ACC_1</code>", parse_mode="HTML", reply_markup=kb_admin_menu())
+        await message.answer("❌ Не понял label. Пример: <code>YA_ACC_1</code>", parse_mode="HTML", reply_markup=_KB_ADMIN_MENU)
         return
 
     async with session_scope() as session:
-        acc = await session.scalar(select(YandexAccount).where(YandexAccount.label == label).limit(1))
+        acc = await session.scalar(_STMT_ACC_BY_LABEL, {"label": label})
         if not acc:
-            await message.answer("❌ Аккаунт не найден. Проверь LABEL.", reply_markup=kb_admin_menu())
+            await message.answer("❌ Аккаунт не найден. Проверь LABEL.", reply_markup=_KB_ADMIN_MENU)
             return
 
-        await state.update_data(edit_label=label)
+        await state.update_data(edit_label=label, edit_acc_id=acc.id)
 
         await state.set_state(AdminYandexFSM.edit_waiting_plus_end)
         await message.answer(
@@ -6613,21 +6385,18 @@ async def admin_yandex_edit_waiting_label(message: Message, state: FSMContext) -
             "<code>9 февраля 2026</code>\n\n"
             "Или отправь <code>-</code> чтобы не менять дату.",
             parse_mode="HTML",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
         )
 
 
 @router.message(AdminYandexFSM.edit_waiting_plus_end)
 async def admin_yandex_edit_waiting_plus_end(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     txt = (message.text or "").strip()
     data = await state.get_data()
     label = data.get("edit_label")
     if not label:
         await state.clear()
-        await message.answer("❌ Сессия сбилась. Начни редактирование заново.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Сессия сбилась. Начни редактирование заново.", reply_markup=_KB_ADMIN_MENU)
         return
 
     new_dt: datetime | None = None
@@ -6637,15 +6406,15 @@ async def admin_yandex_edit_waiting_plus_end(message: Message, state: FSMContext
             await message.answer(
                 "❌ Формат даты неверный.\nНужно: <code>9 февраля 2026</code> или <code>-</code>",
                 parse_mode="HTML",
-                reply_markup=kb_admin_menu(),
+                reply_markup=_KB_ADMIN_MENU,
             )
             return
 
     async with session_scope() as session:
-        acc = await session.scalar(select(YandexAccount).where(YandexAccount.label == label).limit(1))
+        acc = await _yandex_account_from_state(session, data, id_key="edit_acc_id", label_key="edit_label")
         if not acc:
             await state.clear()
-            await message.answer("❌ Аккаунт не найден.", reply_markup=kb_admin_menu())
+            await message.answer("❌ Аккаунт не найден.", reply_markup=_KB_ADMIN_MENU)
             return
 
         if new_dt:
@@ -6660,64 +6429,39 @@ async def admin_yandex_edit_waiting_plus_end(message: Message, state: FSMContext
         "Issued/Burned слоты не трогаем (S1).\n\n"
         "Если не нужно — отправь <code>-</code>.",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
 @router.message(AdminYandexFSM.edit_waiting_links)
 async def admin_yandex_edit_waiting_links(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     txt = (message.text or "").strip()
     data = await state.get_data()
     label = data.get("edit_label")
     if not label:
         await state.clear()
-        await message.answer("❌ Сессия сбилась. Начни редактирование заново.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Сессия сбилась. Начни редактирование заново.", reply_markup=_KB_ADMIN_MENU)
         return
 
     if txt == "-":
         await state.clear()
-        await message.answer("✅ Изменения сохранены.", reply_markup=kb_admin_menu())
+        await message.answer("✅ Изменения сохранены.", reply_markup=_KB_ADMIN_MENU)
         return
 
     lines = [ln.strip() for ln in txt.splitlines() if ln.strip()]
     if len(lines) != 3:
-        await message.answer("❌ Нужно ровно 3 строки (или отправь <code>-</code>).", parse_mode="HTML", reply_markup=kb_admin_menu())
+        await message.answer("❌ Нужно ровно 3 строки (или отправь <code>-</code>).", parse_mode="HTML", reply_markup=_KB_ADMIN_MENU)
         return
 
     async with session_scope() as session:
-        acc = await session.scalar(select(YandexAccount).where(YandexAccount.label == label).limit(1))
+        acc = await _yandex_account_from_state(session, data, id_key="edit_acc_id", label_key="edit_label")
         if not acc:
             await state.clear()
-            await message.answer("❌ Аккаунт не найден.", reply_markup=kb_admin_menu())
+            await message.answer("❌ Аккаунт не найден.", reply_markup=_KB_ADMIN_MENU)
             return
 
-        updated = 0
-        skipped = 0
-        for idx, link in enumerate(lines, start=1):
-            slot = await session.scalar(
-                select(YandexInviteSlot)
-                .where(YandexInviteSlot.yandex_account_id == acc.id, YandexInviteSlot.slot_index == idx)
-                .limit(1)
-            )
-            if not slot:
-                slot = YandexInviteSlot(
-                    yandex_account_id=acc.id,
-                    slot_index=idx,
-                    invite_link=link,
-                    status="free",
-                )
-                session.add(slot)
-                updated += 1
-            else:
-                if (slot.status or "free") == "free":
-                    slot.invite_link = link
-                    updated += 1
-                else:
-                    skipped += 1
-
+        updated = await _upsert_free_slots(session, acc.id, lines)
+        skipped = len(lines) - updated
         await session.commit()
 
     await state.clear()
@@ -6725,16 +6469,12 @@ async def admin_yandex_edit_waiting_links(message: Message, state: FSMContext) -
         "✅ Аккаунт обновлён.\n\n"
         f"Ссылки обновлены (free): {updated}\n"
         f"Пропущено (issued/burned): {skipped}",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:self_cleanup")
+@router.callback_query(F.data == "admin:vpn:self_cleanup")
 async def admin_vpn_self_cleanup(cb: CallbackQuery) -> None:
-    if not is_admin(cb.from_user.id):
-        await cb.answer()
-        return
-
     tg_id = int(cb.from_user.id)
     async with session_scope() as session:
         fam_peer_ids = set((await session.execute(
@@ -6777,12 +6517,8 @@ async def admin_vpn_self_cleanup(cb: CallbackQuery) -> None:
     await cb.answer()
 
 
-@router.callback_query(lambda c: c.data == "admin:vpn:self_cleanup:do")
+@router.callback_query(F.data == "admin:vpn:self_cleanup:do")
 async def admin_vpn_self_cleanup_do(cb: CallbackQuery) -> None:
-    if not is_admin(cb.from_user.id):
-        await cb.answer()
-        return
-
     tg_id = int(cb.from_user.id)
     status = await cb.message.edit_text('⏳ Удаляю ваши личные WG-профили...', reply_markup=None)
 
@@ -6832,7 +6568,7 @@ async def admin_vpn_self_cleanup_do(cb: CallbackQuery) -> None:
         '',
         'Семейные профили не затронуты.',
     ]
-    await status.edit_text('\n'.join(text), reply_markup=kb_admin_menu(), parse_mode='HTML')
+    await status.edit_text('\n'.join(text), reply_markup=_KB_ADMIN_MENU, parse_mode='HTML')
     await cb.answer('Готово')
 
 
@@ -6840,7 +6576,7 @@ async def admin_vpn_self_cleanup_do(cb: CallbackQuery) -> None:
 # RESET USER (FULL)  + YANDEX MEMBERSHIP CLEANUP
 # ==========================
 
-@router.callback_query(lambda c: c.data == "admin:reset:user")
+@router.callback_query(F.data == "admin:reset:user")
 async def admin_reset_user(cb: CallbackQuery, state: FSMContext) -> None:
     """
     Полный сброс пользователя (TEST):
@@ -6849,10 +6585,6 @@ async def admin_reset_user(cb: CallbackQuery, state: FSMContext) -> None:
     - Yandex membership/слот
     - сброс flow_state/flow_data
     """
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.clear()
     await state.set_state(AdminYandexFSM.reset_wait_user_id)
 
@@ -6860,7 +6592,7 @@ async def admin_reset_user(cb: CallbackQuery, state: FSMContext) -> None:
         "🧨 <b>Полный сброс пользователя</b>\n\n"
         "Отправь TG ID пользователя (число).\n"
         "⚠️ Будут удалены: подписка, VPN, Yandex membership/слот.",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
         parse_mode="HTML",
     )
     await cb.answer()
@@ -6868,20 +6600,16 @@ async def admin_reset_user(cb: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(AdminYandexFSM.reset_wait_user_id)
 async def admin_reset_user_apply(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
-    txt = (message.text or "").strip()
-    if not txt.isdigit():
-        await message.answer("❌ Нужно число (TG ID).", reply_markup=kb_admin_menu())
+    tg_id = parse_uint(message.text)
+    if not tg_id:
+        await message.answer("❌ Нужно число (TG ID).", reply_markup=_KB_ADMIN_MENU)
         return
 
-    tg_id = int(txt)
     await state.clear()
 
     from app.services.admin.reset_user import AdminResetUserService
 
-    msg = await message.answer("⏳ Сбрасываю пользователя...", reply_markup=kb_admin_menu())
+    msg = await message.answer("⏳ Сбрасываю пользователя...", reply_markup=_KB_ADMIN_MENU)
     try:
         await AdminResetUserService().reset_user(tg_id=tg_id)
     except Exception as e:
@@ -6890,7 +6618,7 @@ async def admin_reset_user_apply(message: Message, state: FSMContext) -> None:
             f"❌ Ошибка при сбросе пользователя <code>{tg_id}</code>:\n"
             f"<code>{type(e).__name__}: {e}</code>",
             parse_mode="HTML",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
         )
         return
 
@@ -6898,26 +6626,22 @@ async def admin_reset_user_apply(message: Message, state: FSMContext) -> None:
         f"✅ Пользователь <code>{tg_id}</code> полностью сброшен.\n"
         "Теперь он как новый.",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 # ==========================
 # REFERRALS: MINT (TEST EARNINGS)
 # ==========================
 
-@router.callback_query(lambda c: c.data == "admin:ref:mint")
+@router.callback_query(F.data == "admin:ref:mint")
 async def admin_ref_mint(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.clear()
     await state.set_state(AdminYandexFSM.mint_wait_target_tg)
 
     await cb.message.edit_text(
         "🧪 <b>Mint реф. денег</b>\n\n"
         "Шаг 1/3: отправь TG ID получателя (кому начислить).",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
         parse_mode="HTML",
     )
     await cb.answer()
@@ -6925,36 +6649,30 @@ async def admin_ref_mint(cb: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(AdminYandexFSM.mint_wait_target_tg)
 async def admin_ref_mint_target(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
+    target_tg = parse_uint(message.text)
+    if not target_tg:
+        await message.answer("❌ Нужно число (TG ID).", reply_markup=_KB_ADMIN_MENU)
         return
 
-    txt = (message.text or "").strip()
-    if not txt.isdigit():
-        await message.answer("❌ Нужно число (TG ID).", reply_markup=kb_admin_menu())
-        return
-
-    await state.update_data(target_tg=int(txt))
+    await state.update_data(target_tg=target_tg)
     await state.set_state(AdminYandexFSM.mint_wait_amount)
 
     await message.answer(
         "Шаг 2/3: отправь сумму в ₽ (целое число).\n"
         "Пример: <code>150</code>",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
 @router.message(AdminYandexFSM.mint_wait_amount)
 async def admin_ref_mint_amount(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
-    txt = (message.text or "").strip()
-    if not txt.isdigit():
-        await message.answer("❌ Нужно целое число (₽).", reply_markup=kb_admin_menu())
+    amount = parse_uint(message.text)
+    if not amount:
+        await message.answer("❌ Нужно целое число (₽).", reply_markup=_KB_ADMIN_MENU)
         return
 
-    await state.update_data(amount=int(txt))
+    await state.update_data(amount=amount)
     await state.set_state(AdminYandexFSM.mint_wait_status)
 
     await message.answer(
@@ -6963,18 +6681,15 @@ async def admin_ref_mint_amount(message: Message, state: FSMContext) -> None:
         "— <code>available</code> (сразу доступно)\n\n"
         "Отправь <code>pending</code> или <code>available</code>.",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
 @router.message(AdminYandexFSM.mint_wait_status)
 async def admin_ref_mint_status(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     status = (message.text or "").strip().lower()
     if status not in ("pending", "available"):
-        await message.answer("❌ Нужно: <code>pending</code> или <code>available</code>.", parse_mode="HTML", reply_markup=kb_admin_menu())
+        await message.answer("❌ Нужно: <code>pending</code> или <code>available</code>.", parse_mode="HTML", reply_markup=_KB_ADMIN_MENU)
         return
 
     data = await state.get_data()
@@ -6983,33 +6698,33 @@ async def admin_ref_mint_status(message: Message, state: FSMContext) -> None:
     target_tg = int(data.get("target_tg") or 0)
     amount = int(data.get("amount") or 0)
     if not target_tg or amount <= 0:
-        await message.answer("❌ Сессия сбилась. Начни заново.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Сессия сбилась. Начни заново.", reply_markup=_KB_ADMIN_MENU)
         return
 
+    available_at = None
+    if status == "pending":
+        hold_days = int(getattr(settings, "referral_hold_days", 7) or 7)
+        available_at = _utcnow() + timedelta(days=hold_days)
+
+    # ensure user exists (owner can mint to anyone); rides along as a CTE of the earning insert
+    ensure_user = (
+        pg_insert(User).values(tg_id=target_tg).on_conflict_do_nothing(index_elements=["tg_id"]).cte("ensure_user")
+    )
+
     async with session_scope() as session:
-        # ensure user exists (owner can mint to anyone)
-        u = await session.get(User, target_tg)
-        if not u:
-            u = User(tg_id=target_tg)
-            session.add(u)
-            await session.flush()
-
-        available_at = None
-        if status == "pending":
-            hold_days = int(getattr(settings, "referral_hold_days", 7) or 7)
-            available_at = _utcnow() + timedelta(days=hold_days)
-
-        e = ReferralEarning(
-            referrer_tg_id=target_tg,
-            referred_tg_id=target_tg,
-            payment_id=None,
-            payment_amount_rub=0,
-            percent=0,
-            earned_rub=amount,
-            status=status,
-            available_at=available_at,
+        # Plain Core INSERT: nothing reads the row back, so skip ORM instance construction.
+        await session.execute(
+            insert(ReferralEarning).add_cte(ensure_user).values(
+                referrer_tg_id=target_tg,
+                referred_tg_id=target_tg,
+                payment_id=None,
+                payment_amount_rub=0,
+                percent=0,
+                earned_rub=amount,
+                status=status,
+                available_at=available_at,
+            )
         )
-        session.add(e)
         await session.commit()
 
     await message.answer(
@@ -7018,7 +6733,7 @@ async def admin_ref_mint_status(message: Message, state: FSMContext) -> None:
         f"Сумма: <b>{amount} ₽</b>\n"
         f"Статус: <b>{status}</b>",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
 
@@ -7026,12 +6741,8 @@ async def admin_ref_mint_status(message: Message, state: FSMContext) -> None:
 # REFERRALS: HOLDS (approve pending -> available)
 # ==========================
 
-@router.callback_query(lambda c: c.data == "admin:ref:holds")
+@router.callback_query(F.data == "admin:ref:holds")
 async def admin_ref_holds(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     async with session_scope() as session:
         total_pending = await session.scalar(
             select(func.coalesce(func.sum(ReferralEarning.earned_rub), 0)).where(ReferralEarning.status == "pending")
@@ -7083,16 +6794,13 @@ async def admin_ref_holds(cb: CallbackQuery, state: FSMContext) -> None:
         "Введи TG ID пользователя чтобы посмотреть его pending и (опционально) одобрить.\n"
         "Или отправь <code>all</code> чтобы одобрить ВСЁ pending, где уже прошла дата available_at.",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
     await cb.answer()
 
 
 @router.message(AdminYandexFSM.hold_wait_user_id)
 async def admin_ref_hold_action(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     txt = (message.text or "").strip().lower()
 
     if txt == "all":
@@ -7104,16 +6812,15 @@ async def admin_ref_hold_action(message: Message, state: FSMContext) -> None:
         await message.answer(
             f"✅ Одобрено pending→available: <b>{moved_count}</b> начислений.",
             parse_mode="HTML",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
         )
         return
 
-    if not txt.isdigit():
-        await message.answer("❌ Нужно: TG ID (число) или <code>all</code>.", parse_mode="HTML", reply_markup=kb_admin_menu())
+    tg_id = parse_uint(txt)
+    if not tg_id:
+        await message.answer("❌ Нужно: TG ID (число) или <code>all</code>.", parse_mode="HTML", reply_markup=_KB_ADMIN_MENU)
         return
 
-    tg_id = int(txt)
-
     async with session_scope() as session:
         pending_sum = await session.scalar(
             select(func.coalesce(func.sum(ReferralEarning.earned_rub), 0)).where(
@@ -7148,7 +6855,7 @@ async def admin_ref_hold_action(message: Message, state: FSMContext) -> None:
         f"— В холде: <b>{pending_sum} ₽</b>\n"
         f"— Выплачено: <b>{paid} ₽</b>",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
     # notify user (FIXED: no broken multiline strings)
@@ -7176,55 +6883,41 @@ async def admin_ref_hold_action(message: Message, state: FSMContext) -> None:
 # PAYOUT REQUESTS (ADMIN)
 # ==========================
 
-@router.callback_query(lambda c: c.data == "admin:payouts")
+@router.callback_query(F.data == "admin:payouts")
 async def admin_payouts(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.clear()
 
     async with session_scope() as session:
-        reqs = (
-            await session.scalars(
-                select(PayoutRequest).order_by(PayoutRequest.id.desc()).limit(20)
-            )
-        ).all()
+        # Plain rows with just the rendered columns: no ORM hydration of requisites/note.
+        rows = [_format_payout(r) for r in (await session.execute(_STMT_LAST_PAYOUTS)).all()]
 
-    if not reqs:
+    if not rows:
         await cb.message.edit_text(
             "📤 <b>Заявки на вывод</b>\n\nПока заявок нет.",
-            reply_markup=kb_admin_menu(),
+            reply_markup=_KB_ADMIN_MENU,
             parse_mode="HTML",
         )
         await cb.answer()
         return
 
-    lines = ["📤 <b>Заявки на вывод</b>\n"]
-    for r in reqs:
-        lines.append(
-            f"• ID <code>{r.id}</code> | TG <code>{r.tg_id}</code> | "
-            f"{r.amount_rub} ₽ | <b>{r.status}</b>"
-        )
-
-    lines.append("\nОтправь ID заявки чтобы обработать (approve/reject).")
+    text = (
+        "📤 <b>Заявки на вывод</b>\n\n"
+        + "\n".join(rows)
+        + "\n\nОтправь ID заявки чтобы обработать (approve/reject)."
+    )
 
     await state.set_state(AdminYandexFSM.payout_wait_request_id)
-    await cb.message.edit_text("\n".join(lines), reply_markup=kb_admin_menu(), parse_mode="HTML")
+    await cb.message.edit_text(text, reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
     await cb.answer()
 
 
 @router.message(AdminYandexFSM.payout_wait_request_id)
 async def admin_payout_choose(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
-    txt = (message.text or "").strip()
-    if not txt.isdigit():
-        await message.answer("❌ Нужно число (ID заявки).", reply_markup=kb_admin_menu())
+    req_id = parse_uint(message.text)
+    if not req_id:
+        await message.answer("❌ Нужно число (ID заявки).", reply_markup=_KB_ADMIN_MENU)
         return
 
-    req_id = int(txt)
     await state.update_data(payout_req_id=req_id)
     await state.set_state(AdminYandexFSM.payout_wait_action)
 
@@ -7243,25 +6936,28 @@ async def admin_payout_choose(message: Message, state: FSMContext) -> None:
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:payout:approve")
-async def admin_payout_approve(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
+async def _notify_payout_user(bot, tg_id: int, text: str) -> None:
+    try:
+        await bot.send_message(chat_id=tg_id, text=text, reply_markup=_kb_user_nav(), parse_mode="HTML")
+    except Exception:
+        log.exception("admin_payout_notify_failed tg_id=%s", tg_id)
 
+
+@router.callback_query(F.data == "admin:payout:approve")
+async def admin_payout_approve(cb: CallbackQuery, state: FSMContext) -> None:
     data = await state.get_data()
     req_id = int(data.get("payout_req_id") or 0)
     await state.clear()
 
     if not req_id:
-        await cb.message.edit_text("❌ Сессия сбилась.", reply_markup=kb_admin_menu())
+        await cb.message.edit_text("❌ Сессия сбилась.", reply_markup=_KB_ADMIN_MENU)
         await cb.answer()
         return
 
     async with session_scope() as session:
         req = await session.get(PayoutRequest, req_id)
         if not req:
-            await cb.message.edit_text("❌ Заявка не найдена.", reply_markup=kb_admin_menu())
+            await cb.message.edit_text("❌ Заявка не найдена.", reply_markup=_KB_ADMIN_MENU)
             await cb.answer()
             return
 
@@ -7275,36 +6971,28 @@ async def admin_payout_approve(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.message.edit_text(
         f"✅ Заявка <code>{req_id}</code> отмечена как <b>paid</b>.",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
     await cb.answer()
 
     # notify user
-    try:
-        await cb.bot.send_message(
-            chat_id=tg_id,
-            text=(
-                "✅ <b>Выплата обработана</b>\n\n"
-                f"Заявка: <code>{req_id}</code>\n"
-                f"Статус: <b>paid</b>\n\n"
-                "Ваш баланс:\n"
-                f"— Доступно: <b>{avail} ₽</b>\n"
-                f"— В холде: <b>{pend} ₽</b>\n"
-                f"— Выплачено: <b>{paid} ₽</b>"
-            ),
-            reply_markup=_kb_user_nav(),
-            parse_mode="HTML",
-        )
-    except Exception:
-        pass
+    await _notify_payout_user(
+        cb.bot,
+        tg_id,
+        (
+            "✅ <b>Выплата обработана</b>\n\n"
+            f"Заявка: <code>{req_id}</code>\n"
+            f"Статус: <b>paid</b>\n\n"
+            "Ваш баланс:\n"
+            f"— Доступно: <b>{avail} ₽</b>\n"
+            f"— В холде: <b>{pend} ₽</b>\n"
+            f"— Выплачено: <b>{paid} ₽</b>"
+        ),
+    )
 
 
-@router.callback_query(lambda c: c.data == "admin:payout:reject")
+@router.callback_query(F.data == "admin:payout:reject")
 async def admin_payout_reject(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.set_state(AdminYandexFSM.payout_wait_reject_note)
 
     await cb.message.edit_text(
@@ -7312,16 +7000,13 @@ async def admin_payout_reject(cb: CallbackQuery, state: FSMContext) -> None:
         "Отправь комментарий (почему отклонено). Можно коротко.\n"
         "Если не нужен — отправь <code>-</code>",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
     await cb.answer()
 
 
 @router.message(AdminYandexFSM.payout_wait_reject_note)
 async def admin_payout_reject_note(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
     note = (message.text or "").strip()
     if note == "-":
         note = ""
@@ -7331,13 +7016,13 @@ async def admin_payout_reject_note(message: Message, state: FSMContext) -> None:
     await state.clear()
 
     if not req_id:
-        await message.answer("❌ Сессия сбилась.", reply_markup=kb_admin_menu())
+        await message.answer("❌ Сессия сбилась.", reply_markup=_KB_ADMIN_MENU)
         return
 
     async with session_scope() as session:
         req = await session.get(PayoutRequest, req_id)
         if not req:
-            await message.answer("❌ Заявка не найдена.", reply_markup=kb_admin_menu())
+            await message.answer("❌ Заявка не найдена.", reply_markup=_KB_ADMIN_MENU)
             return
 
         await referral_service.reject_payout(session, request_id=req_id, note=note)
@@ -7349,39 +7034,31 @@ async def admin_payout_reject_note(message: Message, state: FSMContext) -> None:
     await message.answer(
         f"✅ Заявка <code>{req_id}</code> отмечена как <b>rejected</b>.",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
 
-    try:
-        await message.bot.send_message(
-            chat_id=tg_id,
-            text=(
-                "❌ <b>Выплата отклонена</b>\n\n"
-                f"Заявка: <code>{req_id}</code>\n"
-                f"Статус: <b>rejected</b>\n"
-                f"Комментарий: <i>{note or '—'}</i>\n\n"
-                "Ваш баланс:\n"
-                f"— Доступно: <b>{avail} ₽</b>\n"
-                f"— В холде: <b>{pend} ₽</b>\n"
-                f"— Выплачено: <b>{paid} ₽</b>"
-            ),
-            reply_markup=_kb_user_nav(),
-            parse_mode="HTML",
-        )
-    except Exception:
-        pass
+    await _notify_payout_user(
+        message.bot,
+        tg_id,
+        (
+            "❌ <b>Выплата отклонена</b>\n\n"
+            f"Заявка: <code>{req_id}</code>\n"
+            f"Статус: <b>rejected</b>\n"
+            f"Комментарий: <i>{note or '—'}</i>\n\n"
+            "Ваш баланс:\n"
+            f"— Доступно: <b>{avail} ₽</b>\n"
+            f"— В холде: <b>{pend} ₽</b>\n"
+            f"— Выплачено: <b>{paid} ₽</b>"
+        ),
+    )
 
 
 # ==========================
 # BULK APPROVE PENDING -> AVAILABLE (NOTIFY USERS)
 # ==========================
 
-@router.callback_query(lambda c: c.data == "admin:ref:approve_pending")
+@router.callback_query(F.data == "admin:ref:approve_pending")
 async def admin_ref_approve_pending(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     async with session_scope() as session:
         # take snapshot grouped by user for notifications
         rows = (await session.execute(
@@ -7399,7 +7076,7 @@ async def admin_ref_approve_pending(cb: CallbackQuery) -> None:
     await cb.message.edit_text(
         f"✅ Pending→available выполнено.\nОдобрено начислений: <b>{moved_count}</b>",
         parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
+        reply_markup=_KB_ADMIN_MENU,
     )
     await cb.answer()
 
@@ -7458,10 +7135,8 @@ def _foreign_admin_req_text(req: ForeignPaymentRequest) -> str:
     )
 
 
-@router.callback_query(lambda c: c.data == "admin:foreign:menu")
+@router.callback_query(F.data == "admin:foreign:menu")
 async def admin_foreign_menu(cb: CallbackQuery) -> None:
-    if not is_admin(cb.from_user.id):
-        return
     await cb.answer()
     async with session_scope() as session:
         counts = {}
@@ -7476,15 +7151,13 @@ async def admin_foreign_menu(cb: CallbackQuery) -> None:
         f"🔴 Отклонены: <b>{counts['rejected']}</b>"
     )
     try:
-        await cb.message.edit_text(txt, reply_markup=kb_foreign_admin_menu(), parse_mode='HTML')
+        await cb.message.edit_text(txt, reply_markup=_KB_FOREIGN_ADMIN_MENU, parse_mode='HTML')
     except Exception:
-        await cb.message.answer(txt, reply_markup=kb_foreign_admin_menu(), parse_mode='HTML')
+        await cb.message.answer(txt, reply_markup=_KB_FOREIGN_ADMIN_MENU, parse_mode='HTML')
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:foreign:list:"))
+@router.callback_query(F.data.startswith("admin:foreign:list:"))
 async def admin_foreign_list(cb: CallbackQuery) -> None:
-    if not is_admin(cb.from_user.id):
-        return
     await cb.answer()
     status = cb.data.rsplit(':',1)[1]
     async with session_scope() as session:
@@ -7494,7 +7167,7 @@ async def admin_foreign_list(cb: CallbackQuery) -> None:
         rows = (await session.execute(stmt.order_by(ForeignPaymentRequest.id.desc()).limit(15))).scalars().all()
     if not rows:
         txt = '💸 <b>Заявки по зарубежным платежам</b>\n\nПо этому фильтру пока ничего нет.'
-        kb = kb_foreign_admin_menu()
+        kb = _KB_FOREIGN_ADMIN_MENU
     else:
         txt = '💸 <b>Заявки по зарубежным платежам</b>\n\nВыберите заявку из списка ниже.'
         items = []
@@ -7508,10 +7181,8 @@ async def admin_foreign_list(cb: CallbackQuery) -> None:
         await cb.message.answer(txt, reply_markup=kb, parse_mode='HTML')
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:foreign:view:"))
+@router.callback_query(F.data.startswith("admin:foreign:view:"))
 async def admin_foreign_view(cb: CallbackQuery) -> None:
-    if not is_admin(cb.from_user.id):
-        return
     await cb.answer()
     try:
         req_id = int(cb.data.rsplit(':',1)[1])
@@ -7528,10 +7199,8 @@ async def admin_foreign_view(cb: CallbackQuery) -> None:
         await cb.message.answer(_foreign_admin_req_text(req), reply_markup=kb_foreign_admin_request_view(req.id, req.status), parse_mode='HTML')
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:foreign:set:"))
+@router.callback_query(F.data.startswith("admin:foreign:set:"))
 async def admin_foreign_set_status(cb: CallbackQuery) -> None:
-    if not is_admin(cb.from_user.id):
-        return
     await cb.answer()
     parts = cb.data.split(':')
     if len(parts) < 5:
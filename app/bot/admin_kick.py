@@ -1,43 +1,66 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timezone
+from functools import lru_cache
 
-from aiogram import Router
+from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
-from sqlalchemy import func, select
+from sqlalchemy import case, func, select, update
 from sqlalchemy.orm import aliased
 
-from app.bot.auth import is_owner
+from app.bot.auth import OwnerFilter
 from app.bot.keyboards import kb_admin_menu
+from app.bot.ui import parse_uint
 from app.db.models.subscription import Subscription
 from app.db.models.vpn_peer import VpnPeer
 from app.db.models.yandex_membership import YandexMembership
 from app.db.session import session_scope
 
 router = Router()
+# Every handler here is owner-only.
+router.message.filter(OwnerFilter())
+router.callback_query.filter(F.data.startswith("admin:"))
+router.callback_query.filter(OwnerFilter())
+
+# The admin menu has no per-user state (only process-wide settings), so build it once.
+_KB_ADMIN_MENU = kb_admin_menu()
+
+
+# One report row per due user; formatted in a single call instead of a long f-string chain.
+_DUE_ROW_TMPL = (
+    "<b>#{i}</b>\n"
+    "Пользователь ID TG: <code>{tg}</code>\n"
+    "Дата приобретения подписки на сервис: <code>{start}</code>\n"
+    "Дата окончания подписки на сервис: <code>{end}</code>\n"
+    "Статус Яндекс семьи: <b>{membership}</b>\n"
+    "Наименование семьи (label): <code>{fam}</code>\n"
+    "Номер слота: <code>{slot}</code>\n"
+    "VPN: <b>{vpn}</b>\n"
+    "Исключить: <b>{kick}</b>\n"
+    "Продление: <b>{renewal}</b>\n"
+    "Пользователь с нами: <b>{days}</b>\n"
+)
 
 
 class AdminKickFSM(StatesGroup):
     waiting_tg_id = State()
 
 
+@lru_cache(maxsize=1024)
+def _fmt_day_utc(ts: float) -> str:
+    # Report rows often share the same instant (end-of-day expirations), so memoize.
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
 def _fmt_dt_short(dt: datetime | None) -> str:
     if not dt:
         return "—"
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(timezone.utc).strftime("%Y-%m-%d")
-
-
-def _sub_start_dt(sub: Subscription) -> datetime | None:
-    """Return subscription start timestamp in a backwards-compatible way.
-
-    The current Subscription model uses `start_at` (not `created_at`). Some
-    older versions referenced `created_at`, so we resolve robustly.
-    """
-    return getattr(sub, "created_at", None) or getattr(sub, "start_at", None)
+    return _fmt_day_utc(dt.timestamp())
 
 
 def _fmt_hours_left(target: datetime, now: datetime) -> str:
@@ -59,29 +82,15 @@ def _fmt_hours_left(target: datetime, now: datetime) -> str:
     return f"просрочено на {hours} ч {mins} мин"
 
 
-def _renewal_text(*, sub_end_at: datetime | None, coverage_end_at: datetime | None, has_membership: bool) -> str:
-    """Return a truthful renewal text.
-
-    We consider 'Продлевалась' only when user has a membership row with
-    coverage_end_at and subscription end is AFTER that coverage end.
-    If user is not in Yandex family, the renewal concept is not applicable.
-    """
-    if not has_membership:
-        return "—"
-    if not sub_end_at or not coverage_end_at:
-        return "Не продлевалась"
-    se = sub_end_at if sub_end_at.tzinfo else sub_end_at.replace(tzinfo=timezone.utc)
-    ce = coverage_end_at if coverage_end_at.tzinfo else coverage_end_at.replace(tzinfo=timezone.utc)
-    return "Продлевалась" if se > ce else "Не продлевалась"
+# `renewed` column of the due query -> label. NULL means no membership (renewal not applicable).
+_RENEWAL_TEXT = {None: "—", True: "Продлевалась", False: "Не продлевалась"}
 
 
-@router.callback_query(lambda c: c.data == "admin:kick:report")
+@router.callback_query(F.data == "admin:kick:report")
 async def admin_kick_report(cb: CallbackQuery) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     now = datetime.now(timezone.utc)
+    # Acknowledge the tap before the report queries run instead of after the edit.
+    await cb.answer()
 
     # Show expiring subscriptions even if the user isn't currently added to a Yandex family.
     # Use only the latest active (removed_at IS NULL) membership row per TG to avoid duplicates.
@@ -99,8 +108,16 @@ async def admin_kick_report(cb: CallbackQuery) -> None:
             .subquery()
         )
 
+        # Plain column tuples: the report only renders these fields, so skip ORM entity loading.
         base = (
-            select(Subscription, YM)
+            select(
+                Subscription.tg_id,
+                Subscription.start_at,
+                Subscription.end_at,
+                YM.id,
+                YM.account_label,
+                YM.slot_index,
+            )
             .select_from(Subscription)
             .outerjoin(latest_active_ids, latest_active_ids.c.tg_id == Subscription.tg_id)
             .outerjoin(YM, YM.id == latest_active_ids.c.id)
@@ -109,7 +126,17 @@ async def admin_kick_report(cb: CallbackQuery) -> None:
 
         due_rows = (
             await session.execute(
-                base.where(Subscription.end_at <= now)
+                base.add_columns(
+                    # NULL when start_at is unknown; interval days, so partial days round down like timedelta.days.
+                    func.extract("day", now - Subscription.start_at).label("days_with_us"),
+                    # 'Продлевалась' only with a membership whose coverage ended before the subscription end;
+                    # a NULL coverage_end_at counts as not renewed.
+                    case(
+                        (YM.id.is_(None), None),
+                        else_=func.coalesce(Subscription.end_at > YM.coverage_end_at, False),
+                    ).label("renewed"),
+                )
+                .where(Subscription.end_at <= now)
                 .order_by(Subscription.end_at.asc(), Subscription.tg_id.asc())
                 .limit(200)
             )
@@ -119,23 +146,21 @@ async def admin_kick_report(cb: CallbackQuery) -> None:
             await session.execute(
                 base.where(Subscription.end_at > now)
                 .order_by(Subscription.end_at.asc(), Subscription.tg_id.asc())
-                .limit(30)
+                .limit(20)
             )
         ).all()
 
-        # Preload VPN peer states in one query to avoid per-user DB chatter.
-        tg_ids: set[int] = {int(sub.tg_id) for sub, _m in (due_rows + soon_rows)}
-        peer_states: dict[int, dict[str, bool]] = {tid: {"any": False, "active": False} for tid in tg_ids}
+        # Preload VPN peer states for the due users in one aggregated query:
+        # one row per TG that has any peer, flagged if at least one is active.
+        tg_ids = [int(row.tg_id) for row in due_rows]
+        peer_active: dict[int, bool] = {}
         if tg_ids:
             peer_rows = await session.execute(
-                select(VpnPeer.tg_id, VpnPeer.is_active).where(VpnPeer.tg_id.in_(list(tg_ids)))
+                select(VpnPeer.tg_id, func.bool_or(VpnPeer.is_active))
+                .where(VpnPeer.tg_id.in_(tg_ids))
+                .group_by(VpnPeer.tg_id)
             )
-            for tg_id, is_active in peer_rows.all():
-                tid = int(tg_id)
-                st = peer_states.setdefault(tid, {"any": False, "active": False})
-                st["any"] = True
-                if bool(is_active):
-                    st["active"] = True
+            peer_active = {int(tg_id): bool(active) for tg_id, active in peer_rows.all()}
 
     lines: list[str] = []
 
@@ -144,68 +169,51 @@ async def admin_kick_report(cb: CallbackQuery) -> None:
     else:
         lines.append("🚨 <b>Сегодня пора исключить следующих участников:</b>\n")
 
-        for i, (sub, m) in enumerate(due_rows, start=1):
-            days_with_us = "—"
-            try:
-                started_at = _sub_start_dt(sub)
-                if started_at:
-                    created = started_at if started_at.tzinfo else started_at.replace(tzinfo=timezone.utc)
-                    days_with_us = f"{max((now - created).days, 0)} дн."
-            except Exception:
-                pass
+        for i, (tg_id, started_at, end_at, m_id, account_label, slot_index, days, renewed) in enumerate(
+            due_rows, start=1
+        ):
+            days_with_us = f"{max(int(days), 0)} дн." if days is not None else "—"
 
             # VPN status (WireGuard):
             # - No peers at all -> not activated
             # - Peers exist but none active -> disabled
             # - Any active peer -> enabled
-            st = peer_states.get(int(sub.tg_id), {"any": False, "active": False})
-            if not st["any"]:
+            active = peer_active.get(int(tg_id))
+            if active is None:
                 vpn_state = "Не активирован"
-            elif st["active"]:
+            elif active:
                 vpn_state = "Включен"
             else:
                 vpn_state = "Отключен"
 
-            fam = (
-                (getattr(m, "account_label", None) if m else None)
-                or (getattr(m, "family_label", None) if m else None)
-                or "—"
-            )
-            slot = (m.slot_index if m else None) or "—"
-            membership_state = "В семье" if m else "❗️Не добавлен в семью"
-
-            started_at = _sub_start_dt(sub)
-            end_at = sub.end_at if sub.end_at else None
-            hours_line = "—"
-            if end_at:
-                hours_line = _fmt_hours_left(end_at, now)
-
-            renewal = _renewal_text(
-                sub_end_at=sub.end_at,
-                coverage_end_at=getattr(m, "coverage_end_at", None) if m else None,
-                has_membership=bool(m),
-            )
+            fam = account_label or "—"
+            slot = slot_index or "—"
+            membership_state = "В семье" if m_id is not None else "❗️Не добавлен в семью"
+
+            # `base` excludes NULL end_at, so every due row has one.
+            hours_line = _fmt_hours_left(end_at, now)
 
             lines.append(
-                f"<b>#{i}</b>\n"
-                f"Пользователь ID TG: <code>{sub.tg_id}</code>\n"
-                f"Дата приобретения подписки на сервис: <code>{_fmt_dt_short(started_at)}</code>\n"
-                f"Дата окончания подписки на сервис: <code>{_fmt_dt_short(sub.end_at)}</code>\n"
-                f"Статус Яндекс семьи: <b>{membership_state}</b>\n"
-                f"Наименование семьи (label): <code>{fam}</code>\n"
-                f"Номер слота: <code>{slot}</code>\n"
-                f"VPN: <b>{vpn_state}</b>\n"
-                f"Исключить: <b>{hours_line}</b>\n"
-                f"Продление: <b>{renewal}</b>\n"
-                f"Пользователь с нами: <b>{days_with_us}</b>\n"
+                _DUE_ROW_TMPL.format(
+                    i=i,
+                    tg=tg_id,
+                    start=_fmt_dt_short(started_at),
+                    end=_fmt_dt_short(end_at),
+                    membership=membership_state,
+                    fam=fam,
+                    slot=slot,
+                    vpn=vpn_state,
+                    kick=hours_line,
+                    renewal=_RENEWAL_TEXT[renewed],
+                    days=days_with_us,
+                )
             )
 
     if soon_rows:
         lines.append("\n📅 <b>Ближайшие к исключению (по дате окончания):</b>")
-        for sub, m in soon_rows[:20]:
-            if not sub.end_at:
-                continue
-            dt = sub.end_at if sub.end_at.tzinfo else sub.end_at.replace(tzinfo=timezone.utc)
+        # `base` already excludes NULL end_at, and the query returns exactly the rows shown.
+        for row in soon_rows:
+            dt = row.end_at
             # Prefer hours/minutes for near-term expirations.
             seconds_left = int((dt - now).total_seconds())
             if seconds_left <= 0:
@@ -215,13 +223,9 @@ async def admin_kick_report(cb: CallbackQuery) -> None:
             else:
                 days_left = max((dt - now).days, 0)
                 when = f"через {days_left} дн."
-            fam = (
-                (getattr(m, "account_label", None) if m else None)
-                or (getattr(m, "family_label", None) if m else None)
-                or "—"
-            )
+            fam = row.account_label or "—"
             lines.append(
-                f"• <code>{sub.tg_id}</code> — до <code>{_fmt_dt_short(sub.end_at)}</code> ({when}) — семья: <code>{fam}</code>"
+                f"• <code>{row.tg_id}</code> — до <code>{_fmt_dt_short(dt)}</code> ({when}) — семья: <code>{fam}</code>"
             )
 
     text = "\n".join(lines)
@@ -230,7 +234,7 @@ async def admin_kick_report(cb: CallbackQuery) -> None:
     # summary and attach the full report as a file.
     try:
         if len(text) <= 3900:
-            await cb.message.edit_text(text, reply_markup=kb_admin_menu(), parse_mode="HTML")
+            await cb.message.edit_text(text, reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
         else:
             from aiogram.types import BufferedInputFile
             import datetime as _dt
@@ -241,7 +245,7 @@ async def admin_kick_report(cb: CallbackQuery) -> None:
                 + "\n".join(lines[:60])
             )
             summary = summary[:3900]
-            await cb.message.edit_text(summary, reply_markup=kb_admin_menu(), parse_mode="HTML")
+            await cb.message.edit_text(summary, reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
 
             filename = f"kick-report-{_dt.datetime.now(_dt.timezone.utc).strftime('%Y%m%d-%H%M%S')}.txt"
             await cb.message.answer_document(
@@ -250,47 +254,69 @@ async def admin_kick_report(cb: CallbackQuery) -> None:
             )
     except Exception:
         try:
-            await cb.message.answer(text[:3900], reply_markup=kb_admin_menu(), parse_mode="HTML")
+            await cb.message.answer(text[:3900], reply_markup=_KB_ADMIN_MENU, parse_mode="HTML")
         except Exception:
             pass
-    await cb.answer()
 
 
-@router.callback_query(lambda c: c.data == "admin:kick:mark")
+@router.callback_query(F.data == "admin:kick:mark")
 async def admin_kick_mark_start(cb: CallbackQuery, state: FSMContext) -> None:
-    if not is_owner(cb.from_user.id):
-        await cb.answer()
-        return
-
     await state.clear()
     await state.set_state(AdminKickFSM.waiting_tg_id)
 
-    await cb.message.edit_text(
-        "🧾 <b>Отметить пользователя исключённым</b>\n\n"
-        "Отправь <b>ID Telegram</b> пользователя (число).\n"
-        "Я найду его последнюю запись YandexMembership без removed_at и помечу removed_at=сейчас.",
-        reply_markup=kb_admin_menu(),
-        parse_mode="HTML",
+    await asyncio.gather(
+        cb.message.edit_text(
+            "🧾 <b>Отметить пользователя исключённым</b>\n\n"
+            "Отправь <b>ID Telegram</b> пользователя (число).\n"
+            "Я найду его последнюю запись YandexMembership без removed_at и помечу removed_at=сейчас.",
+            reply_markup=_KB_ADMIN_MENU,
+            parse_mode="HTML",
+        ),
+        cb.answer(),
     )
-    await cb.answer()
 
 
 @router.message(AdminKickFSM.waiting_tg_id)
 async def admin_kick_mark_finish(message: Message, state: FSMContext) -> None:
-    if not is_owner(message.from_user.id):
-        return
-
-    txt = (message.text or "").strip()
-    try:
-        tg_id = int(txt)
-    except Exception:
-        await message.answer("❌ Нужен числовой TG ID. Попробуй ещё раз.", reply_markup=kb_admin_menu())
+    tg_id = parse_uint(message.text)
+    if not tg_id:
+        await message.answer("❌ Нужен числовой TG ID. Попробуй ещё раз.", reply_markup=_KB_ADMIN_MENU)
         return
 
     now = datetime.now(timezone.utc)
 
     async with session_scope() as session:
-        # Find the latest membership row (even if already removed) to provide a useful answer.
+        # Common path: mark the latest membership row in one UPDATE ... RETURNING,
+        # instead of SELECT + UPDATE on commit.
+        latest_id = (
+            select(func.max(YandexMembership.id))
+            .where(YandexMembership.tg_id == tg_id)
+            .scalar_subquery()
+        )
+        marked = (
+            await session.execute(
+                update(YandexMembership)
+                .where(YandexMembership.id == latest_id, YandexMembership.removed_at.is_(None))
+                .values(removed_at=now, status="removed")
+                .returning(YandexMembership.account_label, YandexMembership.slot_index)
+                .execution_options(synchronize_session=False)
+            )
+        ).first()
+        if marked is not None:
+            fam, slot = marked
+            await session.commit()
+            await state.clear()
+            await message.answer(
+                "✅ Отмечено как исключённый.\n\n"
+                f"TG: <code>{tg_id}</code>\n"
+                f"Семья: <code>{fam or '—'}</code>\n"
+                f"Слот: <code>{slot or '—'}</code>",
+                parse_mode="HTML",
+                reply_markup=_KB_ADMIN_MENU,
+            )
+            return
+
+        # Nothing to mark: find the latest membership row (even if already removed) to provide a useful answer.
         m = await session.scalar(
             select(YandexMembership)
             .where(YandexMembership.tg_id == tg_id)
@@ -301,7 +327,7 @@ async def admin_kick_mark_finish(message: Message, state: FSMContext) -> None:
             await state.clear()
             await message.answer(
                 "ℹ️ Для этого TG ID нет записей YandexMembership. Возможно пользователь не был добавлен в семью.",
-                reply_markup=kb_admin_menu(),
+                reply_markup=_KB_ADMIN_MENU,
             )
             return
 
@@ -318,22 +344,6 @@ async def admin_kick_mark_finish(message: Message, state: FSMContext) -> None:
                 f"Слот: <code>{slot if slot is not None else '—'}</code>\n"
                 f"removed_at: <code>{removed_at.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M')}</code>",
                 parse_mode="HTML",
-                reply_markup=kb_admin_menu(),
+                reply_markup=_KB_ADMIN_MENU,
             )
             return
-
-        m.removed_at = now
-        m.status = "removed"
-        fam = getattr(m, "family_label", None) or getattr(m, "account_label", None)
-        slot = m.slot_index
-        await session.commit()
-
-    await state.clear()
-    await message.answer(
-        "✅ Отмечено как исключённый.\n\n"
-        f"TG: <code>{tg_id}</code>\n"
-        f"Семья: <code>{fam or '—'}</code>\n"
-        f"Слот: <code>{slot or '—'}</code>",
-        parse_mode="HTML",
-        reply_markup=kb_admin_menu(),
-    )
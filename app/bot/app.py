@@ -1,26 +1,46 @@
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.core.config import settings
-from app.bot.middlewares import CorrelationIdMiddleware, ActivitySeenMiddleware
+from app.bot.middlewares import CorrelationIdMiddleware, ActivitySeenMiddleware, RateLimitMiddleware
 
 from app.bot.handlers import start, nav, referrals, yandex, kinoteka
 from app.bot.admin import router as admin_router
 from app.bot.admin_kick import router as admin_kick_router
 
 
+def _make_fsm_storage() -> BaseStorage:
+    if not settings.fsm_redis_url:
+        return MemoryStorage()
+    # Imported lazily: the redis client is only needed when FSM_REDIS_URL is set.
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+    return RedisStorage.from_url(
+        settings.fsm_redis_url,
+        key_builder=DefaultKeyBuilder(with_bot_id=True),
+        # Admin flows park state between messages; don't let abandoned ones linger forever.
+        state_ttl=86400,
+        data_ttl=86400,
+    )
+
+
 def run_bot():
     bot = Bot(
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
 
-    dp = Dispatcher()
+    dp = Dispatcher(storage=_make_fsm_storage())
 
     dp.message.middleware(CorrelationIdMiddleware())
     dp.callback_query.middleware(CorrelationIdMiddleware())
 
+    # Swallow double/triple taps on the same button before they reach the DB or the Bot API.
+    dp.callback_query.middleware(RateLimitMiddleware())
+
     # Best-effort: mark notifications as "seen" when user interacts.
     dp.message.middleware(ActivitySeenMiddleware())
     dp.callback_query.middleware(ActivitySeenMiddleware())
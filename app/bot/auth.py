@@ -1,13 +1,30 @@
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery, Message
+
 from app.core.config import settings
 
 
+# Settings are frozen at startup, so the owner/admin set is built once.
+_OWNER_IDS: frozenset[int] = frozenset((int(settings.owner_tg_id), *map(int, settings.admin_tg_ids)))
+
+
 def is_owner(tg_id: int) -> bool:
-    tid = int(tg_id)
-    if tid == int(settings.owner_tg_id):
-        return True
-    return tid in set(settings.admin_tg_ids)
+    return int(tg_id) in _OWNER_IDS
 
 
 def is_admin(tg_id: int) -> bool:
     """Alias for backward/forward compatibility."""
     return is_owner(tg_id)
+
+
+class OwnerFilter(BaseFilter):
+    """Router-level guard: lets through only updates from the owner/admins.
+
+    Attach via `router.message.filter(OwnerFilter())` /
+    `router.callback_query.filter(OwnerFilter())` so non-owner updates are
+    rejected before any handler (or FSMContext) is touched.
+    """
+
+    async def __call__(self, event: Message | CallbackQuery) -> bool:
+        user = event.from_user
+        return user is not None and is_owner(user.id)
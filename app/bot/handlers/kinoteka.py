@@ -4,7 +4,8 @@ import logging
 from datetime import datetime
 
 from aiogram import Router, F
-from aiogram.filters import BaseFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 
 from app.bot.keyboards import kb_kinoteka_back
@@ -19,21 +20,10 @@ router = Router()
 log = logging.getLogger(__name__)
 
 
-class _UserFlowStateFilter(BaseFilter):
-    """Async filter which matches only when user.flow_state equals the expected value.
+class KinoFSM(StatesGroup):
+    # Checked by the dispatcher's FSM storage lookup, so unrelated text messages never touch the DB.
+    waiting_query = State()
 
-    We use this instead of SkipHandler because the installed aiogram version
-    in this project doesn't expose SkipHandler.
-    """
-
-    def __init__(self, expected_state: str):
-        self.expected_state = expected_state
-
-    async def __call__(self, message: Message) -> bool:  # type: ignore[override]
-        tg_id = message.from_user.id
-        async with session_scope() as session:
-            user = await session.get(User, tg_id)
-            return bool(user and user.flow_state == self.expected_state)
 
 def _is_sub_active(end_at) -> bool:
     if not end_at:
@@ -45,24 +35,17 @@ def _is_sub_active(end_at) -> bool:
 
 
 @router.callback_query(F.data == "kino:search")
-async def on_kino_search(cb: CallbackQuery) -> None:
+async def on_kino_search(cb: CallbackQuery, state: FSMContext) -> None:
     await cb.answer()
+    tg_id = cb.from_user.id
     # Проверка подписки (как для VPN/Yandex)
     async with session_scope() as session:
-        sub = await get_subscription(session, cb.from_user.id)
+        sub = await get_subscription(session, tg_id)
         if not _is_sub_active(sub.end_at):
             await cb.message.answer("⛔️ Подписка не активна. Сначала оплати доступ.")
             return
 
-        user = await session.get(User, cb.from_user.id)
-        if not user:
-            # ensure_user вызывается внутри get_subscription
-            user = await session.get(User, cb.from_user.id)
-
-        if user:
-            user.flow_state = "await_kino_query"
-            user.flow_data = json.dumps({"started_at": utcnow().isoformat()})
-            await session.commit()
+    await state.set_state(KinoFSM.waiting_query)
 
     await cb.message.answer(
         "🔍 Напиши названием фильма/сериала одним сообщением.\n\n"
@@ -72,8 +55,8 @@ async def on_kino_search(cb: CallbackQuery) -> None:
     )
 
 
-@router.message(F.text, _UserFlowStateFilter("await_kino_query"))
-async def on_kino_query_input(msg: Message) -> None:
+@router.message(KinoFSM.waiting_query, F.text)
+async def on_kino_query_input(msg: Message, state: FSMContext) -> None:
     tg_id = msg.from_user.id
     query = (msg.text or "").strip()
     if not query:
@@ -84,12 +67,8 @@ async def on_kino_query_input(msg: Message) -> None:
         )
         return
 
-    async with session_scope() as session:
-        user = await session.get(User, tg_id)
-        # Сбрасываем состояние в любом случае (чтобы не висело)
-        if user:
-            user.flow_state = None
-            await session.commit()
+    # Сбрасываем состояние в любом случае (чтобы не висело)
+    await state.clear()
 
     try:
         results = await rezka_client.search(query, limit=6)
@@ -152,6 +131,7 @@ async def on_kino_query_input(msg: Message) -> None:
 @router.callback_query(F.data.startswith("kino:item:"))
 async def on_kino_item(cb: CallbackQuery) -> None:
     await cb.answer()
+    tg_id = cb.from_user.id
 
     try:
         idx = int(cb.data.split(":", 2)[2])
@@ -160,7 +140,7 @@ async def on_kino_item(cb: CallbackQuery) -> None:
 
     # Загружаем сохранённые результаты из flow_data
     async with session_scope() as session:
-        user = await session.get(User, cb.from_user.id)
+        user = await session.get(User, tg_id)
         data = {}
         if user and user.flow_data:
             try:
@@ -187,7 +167,7 @@ async def on_kino_item(cb: CallbackQuery) -> None:
         )
         return
     except Exception:
-        log.exception("Kinoteka get_info failed", extra={"tg_id": cb.from_user.id, "url": url})
+        log.exception("Kinoteka get_info failed", extra={"tg_id": tg_id, "url": url})
         await cb.message.answer("⚠️ Временная ошибка. Попробуй ещё раз позже.")
         return
 
@@ -223,21 +203,21 @@ async def on_kino_item(cb: CallbackQuery) -> None:
     token = None
     try:
         async with session_scope() as session:
-            sub = await get_subscription(session, cb.from_user.id)
+            sub = await get_subscription(session, tg_id)
             if not _is_sub_active(sub.end_at):
                 await cb.message.answer("⛔️ Подписка не активна. Сначала оплати доступ.")
                 return
 
             token = await create_content_request(
                 session,
-                cb.from_user.id,
+                tg_id,
                 content_url=url,
                 ttl_seconds=settings.content_request_ttl_seconds,
             )
             await session.commit()
 
     except Exception:
-        log.exception("Failed to create content_request token", extra={"tg_id": cb.from_user.id, "url": url})
+        log.exception("Failed to create content_request token", extra={"tg_id": tg_id, "url": url})
 
     player_link = None
     if token:
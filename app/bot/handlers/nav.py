@@ -4,6 +4,7 @@ import asyncio
 import io
 import json
 import os
+import re
 from html import escape as html_escape
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
@@ -30,6 +31,7 @@ from dateutil.relativedelta import relativedelta
 from sqlalchemy import select, func, literal, text
 
 from app.bot.auth import is_owner
+from app.bot.handlers.kinoteka import KinoFSM
 from app.repo import utcnow
 from app.bot.keyboards import (
     kb_back_home,
@@ -81,10 +83,13 @@ class ForeignRequestFSM(StatesGroup):
     waiting_details = State()
 
 
+# Same alphabet as str.isalnum() + "_-", stripped in one C-level pass.
+_PROMO_STRIP_RE = re.compile(r"[^\w-]+")
+
+
 def _promo_norm(code: str) -> str:
     code = (code or "").strip().upper()
-    code = "".join(ch for ch in code if ch.isalnum() or ch in "_-")
-    return code[:32]
+    return _PROMO_STRIP_RE.sub("", code)[:32]
 
 
 async def _promo_defs(session) -> dict[str, int]:
@@ -158,12 +163,9 @@ def _calculate_total(amount_raw: str, fee_percent: int) -> tuple[str, str] | Non
 
 
 async def _notify_foreign_request(bot: Bot, text: str) -> None:
-    recipients = [int(settings.owner_tg_id), *[int(x) for x in settings.admin_tg_ids]]
-    seen: set[int] = set()
+    # dict.fromkeys: de-dup while keeping the owner first
+    recipients = dict.fromkeys([int(settings.owner_tg_id), *[int(x) for x in settings.admin_tg_ids]])
     for tg_id in recipients:
-        if tg_id in seen:
-            continue
-        seen.add(tg_id)
         try:
             await bot.send_message(tg_id, text, parse_mode="HTML", disable_web_page_preview=True)
         except Exception:
@@ -1374,6 +1376,12 @@ async def _get_yandex_membership(session, tg_id: int) -> YandexMembership | None
     return res.scalar_one_or_none()
 
 
+async def _leave_kino_search(state: FSMContext) -> None:
+    """Going home abandons a pending kinoteka search (other FSM flows are left alone)."""
+    if await state.get_state() == KinoFSM.waiting_query.state:
+        await state.clear()
+
+
 async def _cleanup_flow_messages_for_user(bot, chat_id: int, tg_id: int) -> None:
     """
     Legacy cleanup: раньше тут были подсказки/скрины для ввода логина.
@@ -1400,22 +1408,24 @@ async def _cleanup_flow_messages_for_user(bot, chat_id: int, tg_id: int) -> None
 
 
 @router.callback_query(lambda c: c.data and c.data.startswith("nav:"))
-async def on_nav(cb: CallbackQuery) -> None:
+async def on_nav(cb: CallbackQuery, state: FSMContext) -> None:
     # Answer ASAP for *all* nav callbacks to avoid Telegram callback timeouts.
     # Some branches do DB/SSH/network work and can take a few seconds.
     await _safe_cb_answer(cb)
+    tg_id = cb.from_user.id
 
     where = cb.data.split(":", 1)[1]
 
     if where == "home_vpn":
         # "Главное меню" under VPN config/QR: delete config messages immediately.
         try:
-            await _delete_last_vpn_conf_messages(cb.bot, tg_id=cb.from_user.id)
+            await _delete_last_vpn_conf_messages(cb.bot, tg_id=tg_id)
         except Exception:
             pass
-        await _cleanup_flow_messages_for_user(cb.bot, cb.message.chat.id, cb.from_user.id)
+        await _cleanup_flow_messages_for_user(cb.bot, cb.message.chat.id, tg_id)
+        await _leave_kino_search(state)
         try:
-            show_trial = await _trial_visible_for_user(cb.from_user.id)
+            show_trial = await _trial_visible_for_user(tg_id)
             home_text = await _build_home_text()
             home_kb = kb_main(show_trial=show_trial)
             try:
@@ -1432,9 +1442,10 @@ async def on_nav(cb: CallbackQuery) -> None:
 
     if where == "home":
         # Home text may wait on VPN status; callback already answered above.
-        await _cleanup_flow_messages_for_user(cb.bot, cb.message.chat.id, cb.from_user.id)
+        await _cleanup_flow_messages_for_user(cb.bot, cb.message.chat.id, tg_id)
+        await _leave_kino_search(state)
         try:
-            show_trial = await _trial_visible_for_user(cb.from_user.id)
+            show_trial = await _trial_visible_for_user(tg_id)
             home_text = await _build_home_text()
             home_kb = kb_main(show_trial=show_trial)
             try:
@@ -1471,16 +1482,16 @@ async def on_nav(cb: CallbackQuery) -> None:
 
     if where == "cabinet":
         async with session_scope() as session:
-            sub = await get_subscription(session, cb.from_user.id)
-            ym = await _get_yandex_membership(session, cb.from_user.id)
-            ref_code = await referral_service.ensure_ref_code(session, cb.from_user.id)
-            active_refs = await referral_service.count_active_referrals(session, cb.from_user.id)
-            bal_av, bal_pend, bal_paid = await referral_service.get_balances(session, tg_id=cb.from_user.id)
-            inviter_id = await referral_service.get_inviter_tg_id(session, tg_id=cb.from_user.id)
+            sub = await get_subscription(session, tg_id)
+            ym = await _get_yandex_membership(session, tg_id)
+            ref_code = await referral_service.ensure_ref_code(session, tg_id)
+            active_refs = await referral_service.count_active_referrals(session, tg_id)
+            bal_av, bal_pend, bal_paid = await referral_service.get_balances(session, tg_id=tg_id)
+            inviter_id = await referral_service.get_inviter_tg_id(session, tg_id=tg_id)
 
             q = (
                 select(Payment)
-                .where(Payment.tg_id == cb.from_user.id)
+                .where(Payment.tg_id == tg_id)
                 .order_by(Payment.id.desc())
                 .limit(5)
             )
@@ -1506,7 +1517,7 @@ async def on_nav(cb: CallbackQuery) -> None:
 
         text = (
             "👤 <b>Личный кабинет</b>\n\n"
-            f"🆔 ID: <code>{cb.from_user.id}</code>\n\n"
+            f"🆔 ID: <code>{tg_id}</code>\n\n"
             f"💳 Подписка: {'активна ✅' if _is_sub_active(sub.end_at) else 'не активна ❌'}\n"
             f"📅 Активна до: {fmt_dt(sub.end_at)}\n"
             f"⏳ Осталось: <b>{_fmt_time_left_short(sub.end_at)}</b>\n"
@@ -1523,7 +1534,7 @@ async def on_nav(cb: CallbackQuery) -> None:
         try:
             await cb.message.edit_text(
                 text,
-                reply_markup=kb_cabinet(is_owner=is_owner(cb.from_user.id)),
+                reply_markup=kb_cabinet(is_owner=is_owner(tg_id)),
                 parse_mode="HTML",
             )
         except Exception:
@@ -1559,18 +1570,18 @@ async def on_nav(cb: CallbackQuery) -> None:
 
     if where == "referrals":
         async with session_scope() as session:
-            user = await session.get(User, cb.from_user.id)
+            user = await session.get(User, tg_id)
             if not user:
-                user = await ensure_user(session, cb.from_user.id)
+                user = await ensure_user(session, tg_id)
                 await session.commit()
             code = await referral_service.ensure_ref_code(session, user)
 
-            progress = await referral_service.percent_progress(session, cb.from_user.id)
+            progress = await referral_service.percent_progress(session, tg_id)
             active_cnt = int(progress.get("active_referrals", 0) or 0)
-            pending_sum, avail_sum = await referral_service.get_balance(session, cb.from_user.id)
+            pending_sum, avail_sum = await referral_service.get_balance(session, tg_id)
             pct = int(progress.get("current_percent", 0) or 0)
-            inviter_id = await referral_service.get_inviter_tg_id(session, tg_id=cb.from_user.id)
-            refs = await referral_service.list_referrals_summary(session, tg_id=cb.from_user.id, limit=15)
+            inviter_id = await referral_service.get_inviter_tg_id(session, tg_id=tg_id)
+            refs = await referral_service.list_referrals_summary(session, tg_id=tg_id, limit=15)
 
             # bot username (optional)
             bot_username = getattr(settings, "bot_username", None)
@@ -1624,7 +1635,7 @@ async def on_nav(cb: CallbackQuery) -> None:
         return
 
     if where == "pay":
-        await _render_pay_screen(cb.message, cb.from_user.id)
+        await _render_pay_screen(cb.message, tg_id)
         await _safe_cb_answer(cb)
         return
 
@@ -1634,11 +1645,11 @@ async def on_nav(cb: CallbackQuery) -> None:
         show_my = False
         try:
             async with session_scope() as session:
-                sub = await get_subscription(session, cb.from_user.id)
+                sub = await get_subscription(session, tg_id)
                 if _is_sub_active(sub.end_at):
                     from app.db.models.vpn_peer import VpnPeer
 
-                    q = select(VpnPeer.id).where(VpnPeer.tg_id == cb.from_user.id).limit(1)
+                    q = select(VpnPeer.id).where(VpnPeer.tg_id == tg_id).limit(1)
                     res = await session.execute(q)
                     show_my = res.first() is not None
         except Exception:
@@ -1653,12 +1664,12 @@ async def on_nav(cb: CallbackQuery) -> None:
 
     if where == "yandex":
         async with session_scope() as session:
-            sub = await get_subscription(session, cb.from_user.id)
-            ym = await _get_yandex_membership(session, cb.from_user.id)
+            sub = await get_subscription(session, tg_id)
+            ym = await _get_yandex_membership(session, tg_id)
             has_paid_purchase = bool(await session.scalar(
                 select(Payment.id)
                 .where(
-                    Payment.tg_id == int(cb.from_user.id),
+                    Payment.tg_id == int(tg_id),
                     Payment.status == "success",
                     Payment.amount.is_not(None),
                     Payment.amount > 0,
@@ -2606,6 +2617,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
     from app.services.payments.platega import PlategaClient, PlategaError
     from app.db.models import Payment
 
+    tg_id = cb.from_user.id
     parts = (cb.data or "").split(":")
     if len(parts) != 3:
         await cb.answer()
@@ -2622,7 +2634,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
 
     async with session_scope() as session:
         pay = await session.get(Payment, payment_id)
-        if not pay or pay.tg_id != cb.from_user.id:
+        if not pay or pay.tg_id != tg_id:
             await cb.answer("Платеж не найден")
             return
         if not pay.provider_payment_id:
@@ -2655,7 +2667,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
         if status in ("CONFIRMED", "SUCCESS", "PAID", "COMPLETED"):
             # Family group payment (seats)
             if (pay.provider or "").startswith("platega_family_"):
-                mode, count, slot_no = await _get_family_payment_context(session, cb.from_user.id)
+                mode, count, slot_no = await _get_family_payment_context(session, tg_id)
                 try:
                     seats = int((pay.provider or "").split("_")[-1])
                 except Exception:
@@ -2664,7 +2676,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
 
                 grp, touched_slots = await _apply_family_payment(
                     session,
-                    owner_tg_id=cb.from_user.id,
+                    owner_tg_id=tg_id,
                     seats=seats,
                     mode=mode,
                     slot_no=slot_no,
@@ -2675,7 +2687,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
                 try:
                     await _notify_admins_new_purchase(
                         cb.bot,
-                        buyer_tg_id=cb.from_user.id,
+                        buyer_tg_id=tg_id,
                         amount_rub=int(pay.amount),
                         months=1,
                         provider=str(pay.provider or "platega_family"),
@@ -2701,15 +2713,15 @@ async def on_pay_check(cb: CallbackQuery) -> None:
                 return
 
             if (pay.provider or "") == "platega_lte":
-                sub = await get_subscription(session, cb.from_user.id)
-                await lte_vpn_service.activate_paid_month(cb.from_user.id)
+                sub = await get_subscription(session, tg_id)
+                await lte_vpn_service.activate_paid_month(tg_id)
                 pay.status = "success"
                 await session.commit()
 
                 try:
                     await _notify_admins_new_purchase(
                         cb.bot,
-                        buyer_tg_id=cb.from_user.id,
+                        buyer_tg_id=tg_id,
                         amount_rub=int(pay.amount),
                         months=1,
                         provider=str(pay.provider or "platega_lte"),
@@ -2730,7 +2742,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
                 return
 
             # extend subscription and mark payment
-            sub = await get_subscription(session, cb.from_user.id)
+            sub = await get_subscription(session, tg_id)
             now = utcnow()
             base = sub.end_at if sub.end_at and sub.end_at > now else now
             add_months = int(getattr(pay, "period_months", 1) or 1)
@@ -2738,7 +2750,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
 
             await extend_subscription(
                 session,
-                cb.from_user.id,
+                tg_id,
                 months=add_months,
                 days_legacy=int(getattr(pay, "period_days", 30) or 30),
                 amount_rub=int(pay.amount),
@@ -2751,16 +2763,16 @@ async def on_pay_check(cb: CallbackQuery) -> None:
             try:
                 provider_name = str(pay.provider or "")
                 if provider_name.startswith("platega_winback_"):
-                    await set_app_setting_int(session, f"winback_promo_consumed:{cb.from_user.id}", 1)
+                    await set_app_setting_int(session, f"winback_promo_consumed:{tg_id}", 1)
                 elif provider_name.startswith("platega_promo_"):
                     used_code = provider_name.split("platega_promo_", 1)[1].strip().upper()
                     if used_code:
-                        await set_app_setting_int(session, f"promo:used:{cb.from_user.id}:{used_code}", 1)
-                        await set_app_setting_int(session, f"promo:applied:{cb.from_user.id}:{used_code}", None)
+                        await set_app_setting_int(session, f"promo:used:{tg_id}:{used_code}", 1)
+                        await set_app_setting_int(session, f"promo:applied:{tg_id}:{used_code}", None)
             except Exception:
                 pass
 
-            await _restore_wg_peers_after_payment(session, cb.from_user.id)
+            await _restore_wg_peers_after_payment(session, tg_id)
 
             # referral earnings processing: use the newest successful payment row
             # (extend_subscription inserts a Payment row). We keep original pending row too.
@@ -2768,7 +2780,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
             first_paid_before = int(
                 await session.scalar(
                     select(func.count(Payment.id)).where(
-                        Payment.tg_id == cb.from_user.id,
+                        Payment.tg_id == tg_id,
                         Payment.status == "success",
                         Payment.amount.is_not(None),
                         Payment.amount > 0,
@@ -2792,7 +2804,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
                     from app.services.yandex.service import yandex_service
 
                     new_invite_link = await yandex_service.rotate_membership_for_user_if_needed(
-                        session, tg_id=cb.from_user.id
+                        session, tg_id=tg_id
                     )
             except Exception:
                 # do not fail payment flow
@@ -2810,7 +2822,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
                 try:
                     await _notify_admins_new_purchase(
                         cb.bot,
-                        buyer_tg_id=cb.from_user.id,
+                        buyer_tg_id=tg_id,
                         amount_rub=int(pay.amount),
                         months=add_months,
                         provider=str(pay.provider or "platega"),
@@ -2834,7 +2846,7 @@ async def on_pay_check(cb: CallbackQuery) -> None:
             if new_invite_link:
                 try:
                     await cb.bot.send_message(
-                        cb.from_user.id,
+                        tg_id,
                         "🟡 <b>Yandex Plus</b>\n\n"
                         "Мы обновили ваше приглашение в семейную подписку."
                         "\nНажмите кнопку ниже, чтобы открыть приглашение:",
@@ -3844,8 +3856,9 @@ async def on_trial_start(cb: CallbackQuery) -> None:
 
 @router.callback_query(lambda c: c.data == "yandex:open_invite")
 async def on_yandex_open_invite(cb: CallbackQuery) -> None:
+    tg_id = cb.from_user.id
     async with session_scope() as session:
-        ym = await _get_yandex_membership(session, cb.from_user.id)
+        ym = await _get_yandex_membership(session, tg_id)
         invite_link = str(getattr(ym, "invite_link", "") or "").strip()
         is_current = _is_yandex_membership_current(ym)
 
@@ -3853,7 +3866,7 @@ async def on_yandex_open_invite(cb: CallbackQuery) -> None:
         await cb.answer("Старая ссылка уже недоступна. Запросите новое приглашение в разделе Yandex Plus.", show_alert=True)
         return
 
-    await audit_log_event(cb.from_user.id, kind="yandex_invite_open_clicked", text_preview="yandex invite open")
+    await audit_log_event(tg_id, kind="yandex_invite_open_clicked", text_preview="yandex invite open")
 
     kb = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -5470,10 +5483,11 @@ async def _lte_price_rub() -> int:
 
 @router.callback_query(lambda c: c.data == "vpn:lte")
 async def on_vpn_lte_menu(cb: CallbackQuery) -> None:
+    tg_id = cb.from_user.id
     if not settings.lte_enabled:
         await cb.answer("Раздел временно отключён", show_alert=True)
         return
-    has_sub, sub_end = await _lte_is_main_sub_active(cb.from_user.id)
+    has_sub, sub_end = await _lte_is_main_sub_active(tg_id)
     if not has_sub:
         await cb.message.edit_text(
             "📶 <b>VPN LTE</b>\n\n🚫 Доступен только при активной основной подписке.\nОформи подписку в разделе «💳 Оплата».",
@@ -5482,7 +5496,7 @@ async def on_vpn_lte_menu(cb: CallbackQuery) -> None:
         )
         await _safe_cb_answer(cb)
         return
-    has_access, sub_end, paid = await _lte_has_access(cb.from_user.id)
+    has_access, sub_end, paid = await _lte_has_access(tg_id)
     lte_price = await _lte_price_rub()
     txt = _lte_menu_text(has_access=has_access, sub_end=sub_end, lte_price=lte_price, paid=paid)
     await cb.message.edit_text(txt, reply_markup=kb_lte_vpn(has_access=has_access, activation_rub=lte_price), parse_mode="HTML")
@@ -5499,33 +5513,34 @@ async def on_vpn_lte_about(cb: CallbackQuery) -> None:
 
 @router.callback_query(lambda c: c.data == "vpn:lte:pay")
 async def on_vpn_lte_pay(cb: CallbackQuery) -> None:
-    has_sub, _ = await _lte_is_main_sub_active(cb.from_user.id)
+    tg_id = cb.from_user.id
+    has_sub, _ = await _lte_is_main_sub_active(tg_id)
     if not has_sub:
         await cb.answer("Сначала нужна основная подписка", show_alert=True)
         return
     async with session_scope() as session:
-        paid = await has_successful_payments(session, cb.from_user.id)
+        paid = await has_successful_payments(session, tg_id)
         if not paid:
             await cb.answer("Для пробного периода доплата не нужна", show_alert=True)
             return
     provider = settings.payment_provider
     if provider == "platega":
         lte_price = await _lte_price_rub()
-        await _start_platega_payment(cb, tg_id=cb.from_user.id, amount_override=lte_price, months_override=0, promo_code="lte")
+        await _start_platega_payment(cb, tg_id=tg_id, amount_override=lte_price, months_override=0, promo_code="lte")
         return
     async with session_scope() as session:
-        sub = await get_subscription(session, cb.from_user.id)
-        await lte_vpn_service.activate_paid_month(cb.from_user.id)
+        sub = await get_subscription(session, tg_id)
+        await lte_vpn_service.activate_paid_month(tg_id)
         lte_price = await _lte_price_rub()
-        pay = Payment(tg_id=cb.from_user.id, amount=lte_price, currency="RUB", provider="mock_lte", status="success", period_days=0, period_months=0)
+        pay = Payment(tg_id=tg_id, amount=lte_price, currency="RUB", provider="mock_lte", status="success", period_days=0, period_months=0)
         session.add(pay)
         await session.commit()
     try:
         async with session_scope() as session:
-            sub = await get_subscription(session, cb.from_user.id)
+            sub = await get_subscription(session, tg_id)
             await _notify_admins_new_purchase(
                 cb.bot,
-                buyer_tg_id=cb.from_user.id,
+                buyer_tg_id=tg_id,
                 amount_rub=int(lte_price),
                 months=1,
                 provider="mock_lte",
@@ -5540,7 +5555,8 @@ async def on_vpn_lte_pay(cb: CallbackQuery) -> None:
 
 @router.callback_query(lambda c: c.data == "vpn:lte:install")
 async def on_vpn_lte_install(cb: CallbackQuery) -> None:
-    has_access, sub_end, _ = await _lte_has_access(cb.from_user.id)
+    tg_id = cb.from_user.id
+    has_access, sub_end, _ = await _lte_has_access(tg_id)
     if not has_access:
         await cb.answer("Сначала активируйте VPN LTE", show_alert=True)
         return
@@ -5553,8 +5569,8 @@ async def on_vpn_lte_install(cb: CallbackQuery) -> None:
         )
         await _safe_cb_answer(cb)
         return
-    row = await lte_vpn_service.sync_client(cb.from_user.id, subscription_end_at=sub_end, force_rotate=False)
-    url = lte_vpn_service.build_vless_url(row.uuid, tg_id=cb.from_user.id)
+    row = await lte_vpn_service.sync_client(tg_id, subscription_end_at=sub_end, force_rotate=False)
+    url = lte_vpn_service.build_vless_url(row.uuid, tg_id=tg_id)
 
     copy_btn: InlineKeyboardButton | None = None
     if CopyTextButton is not None and 1 <= len(url) <= 256:
@@ -5616,12 +5632,13 @@ async def on_vpn_lte_install(cb: CallbackQuery) -> None:
 
 @router.callback_query(lambda c: c.data == "vpn:lte:reset")
 async def on_vpn_lte_reset(cb: CallbackQuery) -> None:
-    has_access, sub_end, _ = await _lte_has_access(cb.from_user.id)
+    tg_id = cb.from_user.id
+    has_access, sub_end, _ = await _lte_has_access(tg_id)
     if not has_access:
         await cb.answer("Сначала активируйте VPN LTE", show_alert=True)
         return
-    row = await lte_vpn_service.sync_client(cb.from_user.id, subscription_end_at=sub_end, force_rotate=True)
-    url = lte_vpn_service.build_vless_url(row.uuid, tg_id=cb.from_user.id)
+    row = await lte_vpn_service.sync_client(tg_id, subscription_end_at=sub_end, force_rotate=True)
+    url = lte_vpn_service.build_vless_url(row.uuid, tg_id=tg_id)
 
     copy_btn: InlineKeyboardButton | None = None
     if CopyTextButton is not None and 1 <= len(url) <= 256:
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import contextlib
 import logging
 import time
 from datetime import datetime, timezone
@@ -53,6 +54,14 @@ class CorrelationIdMiddleware(BaseMiddleware):
 
 
 class RateLimitMiddleware(BaseMiddleware):
+    """Drops repeated presses of the same button by the same user within `min_interval_sec`.
+
+    Each dropped press is one less handler run and one less edit/answer call
+    against the bot-wide Telegram send limit.
+    """
+
+    _MAX_KEYS = 10_000
+
     def __init__(self, min_interval_sec: float = 0.4):
         self.min_interval_sec = min_interval_sec
         self._last: dict[tuple[int, str], float] = {}
@@ -70,7 +79,15 @@ class RateLimitMiddleware(BaseMiddleware):
             now = time.monotonic()
             last = self._last.get(key)
             if last and (now - last) < self.min_interval_sec:
+                # Still answer the dropped press, otherwise the client keeps spinning on the button.
+                if isinstance(event, CallbackQuery):
+                    with contextlib.suppress(Exception):
+                        await event.answer()
                 return None
+            if len(self._last) >= self._MAX_KEYS:
+                # Entries older than the interval can never suppress anything again.
+                cutoff = now - self.min_interval_sec
+                self._last = {k: t for k, t in self._last.items() if t >= cutoff}
             self._last[key] = now
         return await handler(event, data)
 
@@ -1,14 +1,25 @@
 from __future__ import annotations
 
+import re
 from datetime import datetime, timedelta, timezone
 
 MSK = timezone(timedelta(hours=3))
 
+# Numeric admin input: ASCII digits only, bounded length. Bare int() would also take
+# "1_000", "+5", "-3" and unbounded digit spam.
+_UINT_RE = re.compile(r"\A[0-9]{1,15}\Z")
+
 
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def parse_uint(raw: str | None) -> int | None:
+    """Non-negative integer typed by an admin (surrounding whitespace ignored), or None."""
+    s = (raw or "").strip()
+    return int(s) if _UINT_RE.match(s) else None
+
+
 def fmt_dt(dt: datetime | None) -> str:
     if not dt:
         return "—"
@@ -175,6 +175,10 @@ class Settings:
     lte_anti_sharing_min_events_per_ip: int = 2
     lte_anti_sharing_min_total_events: int = 4
 
+    # FSM storage: empty -> in-process MemoryStorage (single instance);
+    # redis://... -> shared RedisStorage (needed when running several bot replicas)
+    fsm_redis_url: str | None = None
+
 
 def _load_settings() -> Settings:
     # Bot1 uses BOT_TOKEN, Bot2 can use PLAYER_BOT_TOKEN.
@@ -290,6 +294,7 @@ def _load_settings() -> Settings:
         lte_anti_sharing_cooldown_seconds=int(os.getenv("LTE_ANTI_SHARING_COOLDOWN_SECONDS", "1800")),
         lte_anti_sharing_min_events_per_ip=int(os.getenv("LTE_ANTI_SHARING_MIN_EVENTS_PER_IP", "2")),
         lte_anti_sharing_min_total_events=int(os.getenv("LTE_ANTI_SHARING_MIN_TOTAL_EVENTS", "4")),
+        fsm_redis_url=(os.getenv("FSM_REDIS_URL") or "").strip() or None,
     )
 
 
@@ -32,3 +32,5 @@ def setup_logging() -> None:
     handler.setFormatter(JsonFormatter())
     root.handlers.clear()
     root.addHandler(handler)
+    # Pin SQL statement logging explicitly so LOG_LEVEL=DEBUG/INFO never turns on per-query echo.
+    logging.getLogger("sqlalchemy.engine").setLevel(os.getenv("SQL_LOG_LEVEL", "WARNING").upper())
@@ -0,0 +1,34 @@
+"""indexes backing admin kick report / kick-mark lookups
+
+Revision ID: 0019_kick_report_indexes
+Revises: 0018_foreign_payment_requests
+Create Date: 2026-10-18
+
+- admin_kick_report: latest non-removed membership per tg_id and
+  subscriptions ordered by end_at.
+- admin_kick_mark_finish: latest membership by tg_id (ORDER BY id DESC LIMIT 1).
+- VPN peer lookups by tg_id ordered by id; (tg_id, id) replaces the
+  single-column ix_vpn_peers_tg_id from 0001.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0019_kick_report_indexes"
+down_revision = "0018_foreign_payment_requests"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_yandex_memberships_tg_id_id", "yandex_memberships", ["tg_id", "id"])
+    op.create_index("ix_subscriptions_end_at", "subscriptions", ["end_at"])
+    op.create_index("ix_vpn_peers_tg_id_id", "vpn_peers", ["tg_id", "id"])
+    op.drop_index("ix_vpn_peers_tg_id", table_name="vpn_peers")
+
+
+def downgrade() -> None:
+    op.create_index("ix_vpn_peers_tg_id", "vpn_peers", ["tg_id"], unique=False)
+    op.drop_index("ix_vpn_peers_tg_id_id", table_name="vpn_peers")
+    op.drop_index("ix_subscriptions_end_at", table_name="subscriptions")
+    op.drop_index("ix_yandex_memberships_tg_id_id", table_name="yandex_memberships")
@@ -0,0 +1,37 @@
+"""composite index for payout settle/release filters
+
+Revision ID: 0020_hot_filter_indexes
+Revises: 0019_kick_report_indexes
+Create Date: 2026-10-18
+
+- payout settle/release: payout_request_id = ? AND status = 'reserved'.
+  (payout_request_id, status) replaces the single-column
+  ix_referral_earnings_payout_request_id from 0006.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0020_hot_filter_indexes"
+down_revision = "0019_kick_report_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_referral_earnings_payout_request_id_status",
+        "referral_earnings",
+        ["payout_request_id", "status"],
+    )
+    op.drop_index("ix_referral_earnings_payout_request_id", table_name="referral_earnings")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_referral_earnings_payout_request_id",
+        "referral_earnings",
+        ["payout_request_id"],
+        unique=False,
+    )
+    op.drop_index("ix_referral_earnings_payout_request_id_status", table_name="referral_earnings")
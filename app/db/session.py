@@ -14,12 +14,33 @@ _sessionmaker: async_sessionmaker[AsyncSession] | None = None
 
 log = logging.getLogger(__name__)
 
+# Sized for concurrent aiogram handlers; each one holds a connection only for its session_scope().
+DB_POOL_SIZE = 20
+DB_MAX_OVERFLOW = 10
+# Recycle before typical server/proxy idle cutoffs instead of discovering dead sockets via pre-ping.
+DB_POOL_RECYCLE_SEC = 1800
+# The bot issues well over the default 500 distinct statements (admin + user flows); keep them all compiled.
+DB_QUERY_CACHE_SIZE = 1200
+
 
 def init_engine(database_url: str) -> None:
     global _engine, _sessionmaker
     if _engine is not None:
         return
-    _engine = create_async_engine(make_async_db_url(database_url), pool_pre_ping=True)
+    _engine = create_async_engine(
+        make_async_db_url(database_url),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE_SEC,
+        pool_pre_ping=True,
+        query_cache_size=DB_QUERY_CACHE_SIZE,
+        connect_args={
+            # Short OLTP queries only: JIT compile time costs more than it saves.
+            "server_settings": {"application_name": "sbs-bot", "jit": "off"},
+            # Fail a stuck connect fast instead of parking the handler on asyncpg's 60s default.
+            "timeout": 10,
+        },
+    )
     _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
     log.info("db_engine_initialized")
 
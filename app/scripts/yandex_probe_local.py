@@ -17,6 +17,19 @@ _MONTHS_RU = (
     "января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря"
 )
 
+_CHARGE_RE = re.compile(r"(Спишется\s+\d{1,2}\s+(" + _MONTHS_RU + r"))", re.IGNORECASE)
+_NEXT_PAYMENT_RE = re.compile(r"(Следующ(?:ий|ая)\s+плат[её]ж[^\n]*\d{1,2}\s+(" + _MONTHS_RU + r"))", re.IGNORECASE)
+_PAID_UNTIL_RE = re.compile(r"(Оплачено\s+до\s+\d{1,2}\s+(" + _MONTHS_RU + r"))", re.IGNORECASE)
+_CHARGE_LINE_RE = re.compile(r"(Спишется[^\n]+)", re.IGNORECASE)
+
+_PENDING_RE = re.compile(r"Ждём\s+ответ", re.IGNORECASE)
+_ADMIN_RE = re.compile(r"Админ\s*[\u00A0 ]*[·•]\s*[\u00A0 ]*([a-zA-Z0-9._-]{2,128})")
+_LOGIN_RE = re.compile(r"^[a-z0-9][a-z0-9._-]{2,50}$", re.IGNORECASE)
+_SERVICE_LINE_RE = re.compile(
+    r"^(Семейная\s+группа|Возможности\s+группы|Пригласить\s+близкого|Ждём\s+ответ)$",
+    re.I,
+)
+
 
 def extract_next_charge(text: str) -> Optional[str]:
     """
@@ -24,35 +37,34 @@ def extract_next_charge(text: str) -> Optional[str]:
     На практике тексты могут отличаться, поэтому делаем несколько попыток.
     """
     # "Спишется 9 февраля"
-    m = re.search(r"(Спишется\s+\d{1,2}\s+(" + _MONTHS_RU + r"))", text, re.IGNORECASE)
+    m = _CHARGE_RE.search(text)
     if m:
         return m.group(1).strip()
 
     # "Следующий платёж ... 9 февраля"
-    m2 = re.search(r"(Следующ(?:ий|ая)\s+плат[её]ж[^\n]*\d{1,2}\s+(" + _MONTHS_RU + r"))", text, re.IGNORECASE)
+    m2 = _NEXT_PAYMENT_RE.search(text)
     if m2:
         return m2.group(1).strip()
 
     # "Оплачено до 9 февраля"
-    m3 = re.search(r"(Оплачено\s+до\s+\d{1,2}\s+(" + _MONTHS_RU + r"))", text, re.IGNORECASE)
+    m3 = _PAID_UNTIL_RE.search(text)
     if m3:
         return m3.group(1).strip()
 
     # Фолбек: первая строка со "Спишется"
-    m4 = re.search(r"(Спишется[^\n]+)", text, re.IGNORECASE)
+    m4 = _CHARGE_LINE_RE.search(text)
     return m4.group(1).strip() if m4 else None
 
 
 def parse_family_min(text: str) -> dict:
-    pending = len(re.findall(r"Ждём\s+ответ", text, flags=re.IGNORECASE))
+    pending = len(_PENDING_RE.findall(text))
 
     # Админ: "Админ • vladgin9" или "Админ · vladgin9"
     # Учитываем: пробелы, NBSP, разные "пули"
-    admins = re.findall(r"Админ\s*[\u00A0 ]*[·•]\s*[\u00A0 ]*([a-zA-Z0-9._-]{2,128})", text)
+    admins = _ADMIN_RE.findall(text)
 
     # Гости: ищем пары "Имя\nlogin"
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    login_re = re.compile(r"^[a-z0-9][a-z0-9._-]{2,50}$", re.IGNORECASE)
 
     guests = []
     i = 0
@@ -61,15 +73,11 @@ def parse_family_min(text: str) -> dict:
         maybe_login = lines[i + 1]
 
         # пропускаем служебные строки
-        if re.search(
-            r"^(Семейная\s+группа|Возможности\s+группы|Пригласить\s+близкого|Ждём\s+ответ)$",
-            name,
-            re.I,
-        ):
+        if _SERVICE_LINE_RE.search(name):
             i += 1
             continue
 
-        if login_re.match(maybe_login) and maybe_login not in admins:
+        if _LOGIN_RE.match(maybe_login) and maybe_login not in admins:
             guests.append(maybe_login)
             i += 2
             continue
@@ -115,7 +123,11 @@ async def main() -> None:
         try:
             # PLUS
             await page.goto(PLUS_URL, wait_until="domcontentloaded", timeout=60_000)
-            await page.wait_for_timeout(1500)
+            # Wait for the billing text itself instead of a fixed sleep.
+            try:
+                await page.locator("text=/Спишется|Оплачено|Следующ/i").first.wait_for(timeout=15_000)
+            except Exception:
+                pass
 
             plus_text = await page.inner_text("body")
             plus_html = await page.content()
@@ -133,8 +145,6 @@ async def main() -> None:
             except Exception:
                 pass
 
-            await page.wait_for_timeout(800)
-
             fam_text = await page.inner_text("body")
             fam_html = await page.content()
 
@@ -4,7 +4,7 @@ import json
 import logging
 import os
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import delete, insert, select, update
 
 from app.db.session import session_scope
 from app.db.models.user import User
@@ -191,10 +191,11 @@ class AdminResetUserService:
             except Exception:
                 log.exception("admin_reset_user_list_peers_failed tg_id=%s", tg_id)
 
-            # 2) удаляем vpn peers пользователя + family peers
-            await session.execute(delete(VpnPeer).where(VpnPeer.tg_id == tg_id))
+            # 2) удаляем vpn peers пользователя + family peers одним DELETE
+            peer_cond = VpnPeer.tg_id == tg_id
             if family_peer_ids:
-                await session.execute(delete(VpnPeer).where(VpnPeer.id.in_(family_peer_ids)))
+                peer_cond = peer_cond | VpnPeer.id.in_(family_peer_ids)
+            await session.execute(delete(VpnPeer).where(peer_cond))
             await session.execute(delete(FamilyVpnProfile).where(FamilyVpnProfile.owner_tg_id == tg_id))
             await session.execute(delete(FamilyVpnGroup).where(FamilyVpnGroup.owner_tg_id == tg_id))
             await session.execute(delete(LteVpnClient).where(LteVpnClient.tg_id == tg_id))
@@ -203,15 +204,20 @@ class AdminResetUserService:
             await session.execute(delete(PayoutRequest).where(PayoutRequest.tg_id == tg_id))
             await session.execute(delete(ReferralEarning).where((ReferralEarning.referrer_tg_id == tg_id) | (ReferralEarning.referred_tg_id == tg_id)))
             await session.execute(delete(Referral).where((Referral.referrer_tg_id == tg_id) | (Referral.referred_tg_id == tg_id)))
-            for key in [
-                f"family_seat_price_override:{tg_id}",
-                f"trial_used:{tg_id}",
-                f"ua:actions_total:{tg_id}",
-                f"ua:messages_in:{tg_id}",
-                f"ua:clicks_in:{tg_id}",
-                f"ua:last_interaction_ts:{tg_id}",
-            ]:
-                await session.execute(delete(AppSetting).where(AppSetting.key == key))
+            await session.execute(
+                delete(AppSetting).where(
+                    AppSetting.key.in_(
+                        [
+                            f"family_seat_price_override:{tg_id}",
+                            f"trial_used:{tg_id}",
+                            f"ua:actions_total:{tg_id}",
+                            f"ua:messages_in:{tg_id}",
+                            f"ua:clicks_in:{tg_id}",
+                            f"ua:last_interaction_ts:{tg_id}",
+                        ]
+                    )
+                )
+            )
 
             # 3) удаляем платежи
             await session.execute(
@@ -223,33 +229,29 @@ class AdminResetUserService:
             #    - создаём "чистую" неактивную подписку
             await session.execute(delete(Subscription).where(Subscription.tg_id == tg_id))
 
-            sub = Subscription(
-                tg_id=tg_id,
-                start_at=None,
-                end_at=None,
-                is_active=False,
-                status="inactive",
+            await session.execute(
+                insert(Subscription).values(
+                    tg_id=tg_id,
+                    start_at=None,
+                    end_at=None,
+                    is_active=False,
+                    status="inactive",
+                )
             )
-            session.add(sub)
-            await session.flush()
 
-            # 5) сбрасываем пользователя (не удаляем строку, чтобы не ломать связи/логику)
-            user = await session.get(User, tg_id)
-            if user:
-                # reset referral click info (if present)
-                if hasattr(user, "referred_by_tg_id"):
-                    setattr(user, "referred_by_tg_id", None)
-                if hasattr(user, "referred_at"):
-                    setattr(user, "referred_at", None)
-
-                user.flow_state = None
-                user.flow_data = None
-
-                # если у тебя есть поля, которые фиксируют яндекс-логин/статус в User — тоже сбрось:
-                if hasattr(user, "yandex_login"):
-                    setattr(user, "yandex_login", None)
-                if hasattr(user, "yandex_status"):
-                    setattr(user, "yandex_status", None)
+            # 5) сбрасываем пользователя (не удаляем строку, чтобы не ломать связи/логику):
+            #    referral click info + flow state, одним UPDATE без загрузки строки
+            await session.execute(
+                update(User)
+                .where(User.tg_id == tg_id)
+                .values(
+                    referred_by_tg_id=None,
+                    referred_at=None,
+                    flow_state=None,
+                    flow_data=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
 
             await session.commit()
 
@@ -578,17 +578,8 @@ class LteVpnService:
                             warned.append(int(row.tg_id))
             await session.commit()
         # de-dup lists while preserving order
-        def _uniq(vals: list[int]) -> list[int]:
-            seen: set[int] = set()
-            out: list[int] = []
-            for v in vals:
-                if v in seen:
-                    continue
-                seen.add(v)
-                out.append(v)
-            return out
-        warned = [x for x in _uniq(warned) if x not in strict_disabled]
-        strict_disabled = _uniq(strict_disabled)
+        strict_disabled = list(dict.fromkeys(strict_disabled))
+        warned = [x for x in dict.fromkeys(warned) if x not in strict_disabled]
         for tg_id in strict_disabled:
             try:
                 await self.disable_remote_client(tg_id)
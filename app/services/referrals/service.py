@@ -628,18 +628,15 @@ class ReferralService:
         req.status = "paid"
         req.processed_at = _utcnow()
 
-        items = (
-            await session.scalars(
-                select(ReferralEarning).where(
-                    ReferralEarning.payout_request_id == int(request_id),
-                    ReferralEarning.status == "reserved",
-                )
+        # Settle all reserved lines of this request in one statement.
+        await session.execute(
+            ReferralEarning.__table__.update()
+            .where(
+                ReferralEarning.payout_request_id == int(request_id),
+                ReferralEarning.status == "reserved",
             )
-        ).all()
-
-        for e in items:
-            e.status = "paid"
-            e.paid_at = req.processed_at
+            .values(status="paid", paid_at=req.processed_at)
+        )
         await session.flush()
 
     async def reject_payout(self, session, *, request_id: int, note: str | None = None) -> None:
@@ -651,18 +648,15 @@ class ReferralService:
         req.note = (note or "").strip() or None
         req.processed_at = _utcnow()
 
-        items = (
-            await session.scalars(
-                select(ReferralEarning).where(
-                    ReferralEarning.payout_request_id == int(request_id),
-                    ReferralEarning.status == "reserved",
-                )
+        # Release all reserved lines of this request back to available in one statement.
+        await session.execute(
+            ReferralEarning.__table__.update()
+            .where(
+                ReferralEarning.payout_request_id == int(request_id),
+                ReferralEarning.status == "reserved",
             )
-        ).all()
-
-        for e in items:
-            e.status = "available"
-            e.payout_request_id = None
+            .values(status="available", payout_request_id=None)
+        )
         await session.flush()
 
 
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import re
 import shutil
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional, Protocol
+from typing import Any, AsyncIterator, Optional, Protocol
 
-from playwright.async_api import async_playwright, Page
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
 
 from app.core.config import settings
 
@@ -42,6 +44,9 @@ _MONTH_NUM_RU = {
 }
 
 
+_PLUS_END_RE = re.compile(r"Спишется\s+(\d{1,2})\s+([А-Яа-я]+)(?:\s+(\d{4}))?", re.I)
+
+
 def parse_plus_end_at(next_charge_text: str | None, *, now: datetime | None = None) -> Optional[datetime]:
     """Parse 'Спишется 9 февраля' into a timezone-aware datetime (UTC).
 
@@ -57,7 +62,7 @@ def parse_plus_end_at(next_charge_text: str | None, *, now: datetime | None = No
     now = now or datetime.now(timezone.utc)
     text = " ".join(str(next_charge_text).strip().split())
 
-    m = re.search(r"Спишется\s+(\d{1,2})\s+([А-Яа-я]+)(?:\s+(\d{4}))?", text, re.IGNORECASE)
+    m = _PLUS_END_RE.search(text)
     if not m:
         return None
 
@@ -248,6 +253,9 @@ _NEXT_CHARGE_RE = re.compile(
     re.I,
 )
 
+_PENDING_RE = re.compile(r"Жд[её]м\s+ответ", re.I)
+_ADMIN_LOGIN_RE = re.compile(r"Админ\s*[•·]\s*([a-z0-9][a-z0-9._-]{1,63})", re.I)
+
 _CAPTCHA_MARKERS_RE = re.compile(
     r"(captcha|капча|подтвердите|robot|робот|я\s+не\s+робот|пройдите\s+проверку)",
     re.I,
@@ -353,6 +361,18 @@ def _looks_like_bad_family_page(body: str) -> bool:
     return False
 
 
+# Words that LOGIN_LOWER_RE picks up from page chrome/URLs but are never guest logins.
+_LOGIN_BLACKLIST = frozenset({
+    "yandex", "id", "family", "plus",
+    "login", "admin", "pending", "invite",
+    "https", "http", "ru", "com", "org", "www",
+    "mailto", "support", "help", "account", "settings", "profile",
+    "oauth", "token", "clientsource", "from",
+    "skip", "share", "copy", "button", "link", "open", "close",
+    "ok", "cancel",
+})
+
+
 def parse_family_min(text: str) -> Optional[YandexFamilySnapshot]:
     """
     Возвращает None, если по тексту видно что страница не та / не прогрузилась,
@@ -367,37 +387,18 @@ def parse_family_min(text: str) -> Optional[YandexFamilySnapshot]:
     admins: list[str] = []
     guests: list[str] = []
 
-    pending_count = len(re.findall(r"Жд[её]м\s+ответ", text, flags=re.IGNORECASE))
+    pending_count = len(_PENDING_RE.findall(text))
 
-    for m in re.finditer(r"Админ\s*[•·]\s*([a-z0-9][a-z0-9._-]{1,63})", text, re.IGNORECASE):
+    for m in _ADMIN_LOGIN_RE.finditer(text):
         admins.append(m.group(1).lower())
 
-    candidates = set(LOGIN_LOWER_RE.findall(text or ""))
-
-    blacklist = {
-        "yandex", "id", "family", "plus",
-        "login", "admin", "pending", "invite",
-        "https", "http", "ru", "com", "org", "www",
-        "mailto", "support", "help", "account", "settings", "profile",
-        "oauth", "token", "clientsource", "from",
-        "skip", "share", "copy", "button", "link", "open", "close",
-        "ok", "cancel",
-    }
-
-    filtered: list[str] = []
-    for c in candidates:
-        c = c.lower().strip()
-        if c in blacklist:
-            continue
-        if c.isdigit():
-            continue
-        if len(c) < 3:
-            continue
-        if c in admins:
-            continue
-        filtered.append(c)
-
-    filtered.sort()
+    # LOGIN_LOWER_RE only yields lowercase tokens; dedupe + filter in one set build.
+    admin_set = set(admins)
+    filtered = sorted({
+        c
+        for c in LOGIN_LOWER_RE.findall(text)
+        if len(c) >= 3 and not c.isdigit() and c not in _LOGIN_BLACKLIST and c not in admin_set
+    })
     if len(filtered) > 3:
         return None
 
@@ -555,6 +556,56 @@ async def _click_confirm_remove(page: Page) -> bool:
     return False
 
 
+# ==========================
+# Shared Chromium
+# ==========================
+
+# One Chromium process per worker; each operation gets its own isolated context
+# (own cookies/storage_state), so launching a browser per call buys nothing.
+_pw: Playwright | None = None
+_browser: Browser | None = None
+_browser_lock = asyncio.Lock()
+
+
+async def _get_browser() -> Browser:
+    global _pw, _browser
+    async with _browser_lock:
+        if _browser is None or not _browser.is_connected():
+            if _pw is None:
+                _pw = await async_playwright().start()
+            _browser = await _pw.chromium.launch(
+                headless=True,
+                args=["--no-sandbox", "--disable-dev-shm-usage"],
+            )
+        return _browser
+
+
+@asynccontextmanager
+async def _browser_context(storage_state_path: str) -> AsyncIterator[BrowserContext]:
+    browser = await _get_browser()
+    context = await browser.new_context(
+        storage_state=storage_state_path,
+        viewport={"width": 1280, "height": 720},
+        locale="ru-RU",
+    )
+    try:
+        yield context
+    finally:
+        await context.close()
+
+
+async def close_shared_browser() -> None:
+    """Shut down the shared Chromium (call on process exit)."""
+    global _pw, _browser
+    async with _browser_lock:
+        if _browser is not None:
+            await _browser.close()
+            _browser = None
+        if _pw is not None:
+            await _pw.stop()
+            _pw = None
+
+
 class PlaywrightYandexProvider:
     async def probe(self, *, storage_state_path: str) -> YandexProbeSnapshot:
         root = _debug_root()
@@ -568,16 +619,7 @@ class PlaywrightYandexProvider:
         family_snap: Optional[YandexFamilySnapshot] = None
         raw_debug: dict[str, Any] = {"debug_dir": str(debug_dir)}
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-dev-shm-usage"],
-            )
-            context = await browser.new_context(
-                storage_state=storage_state_path,
-                viewport={"width": 1280, "height": 720},
-                locale="ru-RU",
-            )
+        async with _browser_context(storage_state_path) as context:
             page = await context.new_page()
 
             # -------- PLUS: строгий поиск "Спишется ..."
@@ -586,8 +628,7 @@ class PlaywrightYandexProvider:
                 try:
                     url = PLUS_URL if attempt < 3 else PLUS_URL_ALT
                     await _goto(page, url, debug_dir, f"plus_try{attempt}")
-                    # даём SPA дорисовать (иногда "Спишется" появляется позже networkidle)
-                    await page.wait_for_timeout(1200)
+                    # SPA может дорисовать "Спишется" позже networkidle — strict-экстрактор сам ждёт локатор.
                     next_charge_text = await _extract_next_charge_strict(page, debug_dir, timeout_ms=20_000)
 
                     raw_debug["plus_attempt"] = attempt
@@ -625,8 +666,6 @@ class PlaywrightYandexProvider:
                 await _save_debug(page, debug_dir, "family_error")
                 family_snap = None
 
-            await context.close()
-            await browser.close()
 
         return YandexProbeSnapshot(
             next_charge_text=next_charge_text,
@@ -642,16 +681,7 @@ class PlaywrightYandexProvider:
         debug_dir = root / Path(storage_state_path).stem / f"{debug_dir_name}_{_now_tag()}"
         debug_dir.mkdir(parents=True, exist_ok=True)
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-dev-shm-usage"],
-            )
-            context = await browser.new_context(
-                storage_state=storage_state_path,
-                viewport={"width": 1280, "height": 720},
-                locale="ru-RU",
-            )
+        async with _browser_context(storage_state_path) as context:
             page = await context.new_page()
 
             await _goto(page, FAMILY_URL, debug_dir, "family_open")
@@ -663,13 +693,9 @@ class PlaywrightYandexProvider:
                 await _save_debug(page, debug_dir, "pending_opened")
             except Exception:
                 await _save_debug(page, debug_dir, "no_pending")
-                await context.close()
-                await browser.close()
                 return False
 
             cancelled = await _click_by_text(page, "Отменить приглашение", debug_dir, "cancel_clicked")
-            await context.close()
-            await browser.close()
             return bool(cancelled)
 
     async def create_invite_link(
@@ -685,16 +711,7 @@ class PlaywrightYandexProvider:
         debug_dir = root / Path(storage_state_path).stem / f"{debug_dir_name}_{_now_tag()}"
         debug_dir.mkdir(parents=True, exist_ok=True)
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-dev-shm-usage"],
-            )
-            context = await browser.new_context(
-                storage_state=storage_state_path,
-                viewport={"width": 1280, "height": 720},
-                locale="ru-RU",
-            )
+        async with _browser_context(storage_state_path) as context:
             page = await context.new_page()
 
             await _goto(page, FAMILY_URL, debug_dir, "family_open")
@@ -712,8 +729,6 @@ class PlaywrightYandexProvider:
 
             ok = await _click_invite_button_strict(page, debug_dir)
             if not ok:
-                await context.close()
-                await browser.close()
                 if strict:
                     raise RuntimeError(f"Invite button not found. Debug: {debug_dir}")
                 return ""
@@ -723,8 +738,6 @@ class PlaywrightYandexProvider:
             share_clicked = await _click_by_text(page, "Поделиться ссылкой", debug_dir, "share_clicked")
             if not share_clicked:
                 await _save_debug(page, debug_dir, "share_button_not_found")
-                await context.close()
-                await browser.close()
                 if strict:
                     raise RuntimeError(f"Share button not found. Debug: {debug_dir}")
                 return ""
@@ -741,8 +754,6 @@ class PlaywrightYandexProvider:
 
             await _save_debug(page, debug_dir, "invite_final")
 
-            await context.close()
-            await browser.close()
 
         if not invite_link:
             if strict:
@@ -761,16 +772,7 @@ class PlaywrightYandexProvider:
         debug_dir = root / Path(storage_state_path).stem / f"kick_{guest_login}_{_now_tag()}"
         debug_dir.mkdir(parents=True, exist_ok=True)
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-dev-shm-usage"],
-            )
-            context = await browser.new_context(
-                storage_state=storage_state_path,
-                viewport={"width": 1280, "height": 720},
-                locale="ru-RU",
-            )
+        async with _browser_context(storage_state_path) as context:
             page = await context.new_page()
 
             await _goto(page, FAMILY_URL, debug_dir, "family_open")
@@ -788,8 +790,6 @@ class PlaywrightYandexProvider:
 
             if not clicked_card:
                 await _save_debug(page, debug_dir, "guest_card_not_found")
-                await context.close()
-                await browser.close()
                 return False
 
             removed = await _click_by_text(page, "Исключить из семьи", debug_dir, "click_remove")
@@ -798,15 +798,11 @@ class PlaywrightYandexProvider:
 
             if not removed:
                 await _save_debug(page, debug_dir, "remove_button_not_found")
-                await context.close()
-                await browser.close()
                 return False
 
             await _click_confirm_remove(page)
             await _save_debug(page, debug_dir, "remove_confirmed")
 
-            await context.close()
-            await browser.close()
 
         return True
 
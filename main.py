@@ -84,6 +84,12 @@ async def main() -> None:
             with contextlib.suppress(asyncio.CancelledError):
                 await scheduler_task
 
+        # Playwright keeps one shared Chromium alive between Yandex operations.
+        from app.services.yandex.provider import close_shared_browser
+
+        with contextlib.suppress(Exception):
+            await close_shared_browser()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
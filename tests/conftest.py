@@ -0,0 +1,16 @@
+import os
+
+# app.core.config reads these at import time; the tests never talk to Telegram or Postgres.
+for _name, _value in {
+    "BOT_TOKEN": "1:test",
+    "DATABASE_URL": "postgres://test@localhost/test",
+    "OWNER_TG_ID": "1",
+    "WG_SSH_HOST": "localhost",
+    "WG_SSH_USER": "test",
+    "WG_SSH_PASSWORD": "test",
+    "WG_SERVER_PUBLIC_KEY": "test",
+    "WG_ENDPOINT": "localhost:51820",
+    "VPN_ENDPOINT": "localhost:51820",
+    "VPN_SERVER_PUBLIC_KEY": "test",
+}.items():
+    os.environ.setdefault(_name, _value)
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+from aiogram.types import Chat, InaccessibleMessage, Message, MessageEntity
+
+from app.bot.admin import _message_html_text, _yandex_list_text
+
+_CHAT = Chat(id=1, type="private")
+
+
+def _utf16_len(s: str) -> int:
+    return len(s.encode("utf-16-le")) // 2
+
+
+def _entity(text: str, kind: str, sub: str, start: int = 0) -> MessageEntity:
+    i = text.index(sub, start)
+    return MessageEntity(type=kind, offset=_utf16_len(text[:i]), length=_utf16_len(sub))
+
+
+def _telegram_copy(text: str, entities: list[MessageEntity]) -> Message:
+    """The message as Telegram returns it after parsing our HTML: plain text plus entities."""
+    return Message(message_id=1, date=datetime.now(timezone.utc), chat=_CHAT, text=text, entities=entities)
+
+
+def test_round_tripped_list_matches_rendered_html() -> None:
+    rows = [
+        ("acc&1", "active", datetime(2026, 2, 1, tzinfo=timezone.utc), 2, 1),
+        ("acc<2>", "disabled", None, None, 3),
+    ]
+    plain = (
+        "📋 Yandex аккаунты / слоты\n\n"
+        "• acc&1 — active | Plus до: 2026-02-01 | slots free/issued: 2/1\n"
+        "• acc<2> — disabled | Plus до: — | slots free/issued: 0/3"
+    )
+    second = plain.index("• acc<2>")
+    entities = [
+        _entity(plain, "bold", "Yandex аккаунты / слоты"),
+        _entity(plain, "code", "acc&1"),
+        _entity(plain, "code", "2026-02-01"),
+        _entity(plain, "bold", "2", plain.index("issued: ")),
+        _entity(plain, "bold", "1", plain.index("2/1") + 1),
+        _entity(plain, "code", "acc<2>"),
+        _entity(plain, "code", "—", plain.index("Plus до: ", second)),
+        _entity(plain, "bold", "0", plain.index("issued: ", second)),
+        _entity(plain, "bold", "3", plain.index("0/3") + 1),
+    ]
+
+    assert _message_html_text(_telegram_copy(plain, entities)) == _yandex_list_text(rows)
+
+
+def test_inaccessible_message_never_matches() -> None:
+    rows = [("acc1", "active", None, 3, 0)]
+    old = InaccessibleMessage(chat=_CHAT, message_id=1)
+
+    assert _message_html_text(old) != _yandex_list_text(rows)